@@ -0,0 +1,578 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import argparse
+import tempfile
+import platform
+from timeit import default_timer
+
+'''
+benchmark.py
+Benchmarks the hot paths of the mood switch: building the local music service,
+    generating the playlist text-to-speech cache, moving through playlists and
+    dispatching remote input. Runs against synthetic music libraries with
+    GStreamer, espeak and the input/bluetooth hardware stubbed out, and
+    reports the results as JSON.
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Library sizes (total tracks) -> tracks per playlist
+LIBRARY_SIZES = {
+    10      : 10,
+    1000    : 20,
+    100000  : 100,
+}
+# Number of times each measurement is repeated (the best run is reported)
+DEFAULT_REPEAT = 3
+# Number of operations timed for the per-operation benchmarks
+OPS = 10000
+# Device node the stub remote is read from
+DEV_PATH = "/dev/input/event0"
+
+class FakeElement:
+    '''
+    Stand-in for a GStreamer element (playbin2, alsasink) that records state
+        changes but plays nothing
+    '''
+    def __init__(self, *args):
+        '''
+        Constructor
+        '''
+        self.props = {}
+        self.state = FakeGst.STATE_NULL
+
+    def set_property(self, key, value):
+        '''
+        Records a property
+        '''
+        self.props[key] = value
+
+    def get_property(self, key):
+        '''
+        Looks up a recorded property
+        '''
+        return self.props.get(key)
+
+    def set_state(self, state):
+        '''
+        Changes state right away
+        '''
+        self.state = state
+        return FakeGst.STATE_CHANGE_SUCCESS
+
+    def get_state(self, timeout=None):
+        '''
+        Reports the current state (changes never pend)
+        '''
+        return (FakeGst.STATE_CHANGE_SUCCESS, self.state,
+            FakeGst.STATE_VOID_PENDING)
+
+    def get_bus(self):
+        '''
+        Stands in for its own bus
+        '''
+        return self
+
+    def query_position(self, format, *args):
+        '''
+        Reports the start of the stream
+        '''
+        return (0, format)
+
+    def seek_simple(self, *args):
+        '''
+        Accepts any seek
+        '''
+        return True
+
+    def get_by_name(self, name):
+        '''
+        Stands in for any element inside it
+        '''
+        return self
+
+    def get_pad(self, name):
+        '''
+        Stands in for any of its pads
+        '''
+        return self
+
+    def add_data_probe(self, *args):
+        '''
+        Ignores the probe (no data ever flows)
+        '''
+        pass
+
+    def add_event_probe(self, *args):
+        '''
+        Ignores the probe (no events ever flow)
+        '''
+        pass
+
+    def get_request_pad(self, name):
+        '''
+        Hands out the element itself as a mixer pad
+        '''
+        return self
+
+    def release_request_pad(self, pad):
+        '''
+        Does nothing (pads are not tracked)
+        '''
+        pass
+
+    def link(self, other):
+        '''
+        Does nothing (nothing flows between elements)
+        '''
+        pass
+
+    def unlink(self, other):
+        '''
+        Does nothing (nothing flows between elements)
+        '''
+        pass
+
+    def add(self, element):
+        '''
+        Does nothing (bins do not track their children)
+        '''
+        pass
+
+    def remove(self, element):
+        '''
+        Does nothing (bins do not track their children)
+        '''
+        pass
+
+    def get_parent(self):
+        '''
+        Elements are never in a bin
+        '''
+        return None
+
+    def sync_state_with_parent(self):
+        '''
+        Does nothing (there is no parent)
+        '''
+        return True
+
+    def emit(self, *args):
+        '''
+        Ignores the signal
+        '''
+        pass
+
+    def connect(self, *args):
+        '''
+        Ignores the handler (no signals are ever emitted)
+        '''
+        pass
+
+    def add_signal_watch(self):
+        '''
+        Does nothing (no messages are ever posted)
+        '''
+        pass
+
+    def remove_signal_watch(self):
+        '''
+        Does nothing (no messages are ever posted)
+        '''
+        pass
+
+    def enable_sync_message_emission(self):
+        '''
+        Does nothing (no messages are ever posted)
+        '''
+        pass
+
+class FakeGst:
+    '''
+    Attributes of the gst module used by this project
+    '''
+    STATE_VOID_PENDING = 0
+    STATE_NULL = 1
+    STATE_READY = 2
+    STATE_PAUSED = 3
+    STATE_PLAYING = 4
+    STATE_CHANGE_FAILURE = 0
+    STATE_CHANGE_SUCCESS = 1
+    MESSAGE_EOS = 1
+    MESSAGE_ERROR = 2
+    MESSAGE_STATE_CHANGED = 64
+    SECOND = 1000000000
+    FORMAT_TIME = 3
+    SEEK_FLAG_FLUSH = 1
+    SEEK_FLAG_KEY_UNIT = 4
+    EVENT_EOS = 86
+
+    class QueryError(Exception):
+        pass
+
+    @staticmethod
+    def element_factory_make(*args):
+        '''
+        Builds a fake element
+        '''
+        return FakeElement(*args)
+
+    @staticmethod
+    def parse_launch(*args):
+        '''
+        Builds a fake pipeline
+        '''
+        return FakeElement(*args)
+
+    @staticmethod
+    def parse_bin_from_description(*args):
+        '''
+        Builds a fake bin
+        '''
+        return FakeElement(*args)
+
+    @staticmethod
+    def Buffer(data):
+        '''
+        Buffers are just their data
+        '''
+        return data
+
+class FakeInputEvent:
+    '''
+    Stand-in for an evdev input event
+    '''
+    def __init__(self, type, code, value):
+        '''
+        Constructor
+        '''
+        self.type = type
+        self.code = code
+        self.value = value
+        self.time = time.time()
+
+    def timestamp(self):
+        '''
+        Time of the event (seconds since the epoch)
+        '''
+        return self.time
+
+class FakeInputDevice:
+    '''
+    Stand-in for an evdev input device that replays a list of events
+    '''
+    def __init__(self, events):
+        '''
+        Constructor
+        '''
+        self.events = events
+        self.fd = -1
+        self.fn = "/dev/input/fake"
+
+    def read(self):
+        '''
+        Reads the events, the same ones every time
+        '''
+        return iter(self.events)
+
+def mkModule(name, attrs):
+    '''
+    Builds a stub module and registers it
+    :param: name Name of the module
+    :param: attrs Dictionary of module attributes
+    :return: Module object
+    '''
+    module = types.ModuleType(name)
+    for key, value in attrs.items():
+        setattr(module, key, value)
+    sys.modules[name] = module
+    return module
+
+def installStubs():
+    '''
+    Replaces GStreamer with the fake player and, where they are not installed,
+        the input, bluetooth and GPIO modules with empty stand-ins so that
+        remote.py can be imported
+    '''
+    gst = dict((key, getattr(FakeGst, key)) for key in dir(FakeGst)
+        if not(key.startswith("_")))
+    gst['element_factory_make'] = FakeGst.element_factory_make
+    gst['parse_launch'] = FakeGst.parse_launch
+    gst['parse_bin_from_description'] = FakeGst.parse_bin_from_description
+    gst['Buffer'] = FakeGst.Buffer
+    mkModule("gst", gst)
+    mkModule("pygst", {})
+    try:
+        import evdev
+    except ImportError:
+        ecodes = types.ModuleType("ecodes")
+        for code, name in enumerate(["KEY_RESERVED", "KEY_SPACE", "KEY_UP",
+                "KEY_RIGHT", "KEY_LEFT", "KEY_C", "KEY_W", "KEY_S", "KEY_A",
+                "KEY_D", "KEY_ENTER", "KEY_X"]):
+            setattr(ecodes, name, code)
+        ecodes.EV_KEY = 1
+        mkModule("evdev", {
+            'InputDevice'   : FakeInputDevice,
+            'categorize'    : None,
+            'ecodes'        : ecodes,
+            'list_devices'  : lambda: [],
+            'KeyEvent'      : type("KeyEvent", (), { 'key_up' : 0,
+                'key_down' : 1, 'key_hold' : 2 }),
+        })
+    try:
+        import gobject
+    except ImportError:
+        mkModule("gobject", {
+            'MainLoop'      : object,
+            'threads_init'  : lambda: None,
+            'io_add_watch'  : lambda *args: 0,
+            'timeout_add'   : lambda *args: 0,
+            'timeout_add_seconds' : lambda *args: 0,
+            'idle_add'      : lambda *args, **kwargs: 0,
+            'PRIORITY_HIGH' : -100,
+            'source_remove' : lambda *args: True,
+            'IO_IN'         : 1,
+            'IO_ERR'        : 8,
+            'IO_HUP'        : 16,
+        })
+    try:
+        import dbus
+    except ImportError:
+        glib = mkModule("dbus.mainloop.glib", { 'DBusGMainLoop' : None })
+        mainloop = mkModule("dbus.mainloop", { 'glib' : glib })
+        mkModule("dbus", { 'mainloop' : mainloop })
+    try:
+        import RPi.GPIO
+    except ImportError:
+        mkModule("RPi", { 'GPIO' : mkModule("RPi.GPIO", {}) })
+
+def mkLibrary(path, tracks, perPlaylist):
+    '''
+    Generates a synthetic local music directory of empty files
+    :param: path Path to create the music directory in
+    :param: tracks Total number of tracks
+    :param: perPlaylist Number of tracks per playlist
+    '''
+    os.makedirs(path)
+    count = 0
+    pl_id = 0
+    while (count < tracks):
+        pl_path = os.path.join(path, "Playlist %05d" % pl_id)
+        os.makedirs(pl_path)
+        for track_id in range(min(perPlaylist, tracks - count)):
+            name = "%03d_Track.%s" % (track_id, ("mp3", "ogg")[track_id % 2])
+            open(os.path.join(pl_path, name), "w").close()
+            count += 1
+        pl_id += 1
+
+def best(fn, repeat, cleanup=None):
+    '''
+    Times a function, keeping the fastest run
+    :param: fn Function to time; called with no arguments
+    :param: repeat Number of runs
+    :param: cleanup (Optional) Function called (untimed) with the result of
+        each run
+    :return: Best time in seconds
+    '''
+    times = []
+    for i in range(repeat):
+        start = default_timer()
+        result = fn()
+        times.append(default_timer() - start)
+        if (cleanup != None):
+            cleanup(result)
+    return min(times)
+
+def benchLibrary(workDir, tracks, perPlaylist, repeat):
+    '''
+    Runs all benchmarks against one synthetic library
+    :param: workDir Scratch directory
+    :param: tracks Total number of tracks
+    :param: perPlaylist Number of tracks per playlist
+    :param: repeat Number of runs per measurement
+    :return: Dictionary of results (seconds)
+    '''
+    import remote
+    from localmusic import LocalService
+    from metadata import MetadataCache
+    from playback import Playback
+    from ttscache import TTSCache
+
+    results = {}
+    musicPath = os.path.join(workDir, "local_music") + "/"
+    cachePath = os.path.join(workDir, "cache") + "/"
+    start = default_timer()
+    mkLibrary(musicPath, tracks, perPlaylist)
+    results['generate_library'] = default_timer() - start
+
+    # === LocalService construction ===
+    # the background metadata refresh is timed on its own (below); left
+    # running, it competes with the start-up being timed and hides what the
+    # library index saves
+    refreshAsync = MetadataCache.refreshAsync
+    MetadataCache.refreshAsync = lambda self, getPaths, onDone=None: None
+    try:
+        def coldScan():
+            shutil.rmtree(cachePath, ignore_errors=True)
+            os.makedirs(cachePath)
+            LocalService(musicPath, cachePath)
+        results['local_service_cold'] = best(coldScan, repeat)
+        # first run writes the library index, the rest read it
+        service = LocalService(musicPath, cachePath)
+        results['local_service_indexed'] = best(
+            lambda: LocalService(musicPath, cachePath), repeat)
+        results['local_service_lazy'] = best(
+            lambda: LocalService(musicPath, cachePath, lazy=True), repeat)
+    finally:
+        MetadataCache.refreshAsync = refreshAsync
+
+    # === MetadataCache refresh (the background thread's work) ===
+    paths = service.trackPaths()
+    def coldMetadata():
+        cache = MetadataCache(service.metadata.fileName)
+        cache.refresh(paths)
+    results['metadata_refresh_cold'] = best(coldMetadata, repeat)
+    # the last cold run saved the cache; the rest only stat the files
+    def cachedMetadata():
+        cache = MetadataCache(service.metadata.fileName)
+        cache.load()
+        cache.refresh(paths)
+    results['metadata_refresh_cached'] = best(cachedMetadata, repeat)
+
+    # === Playback.init_cache (text-to-speech generation) ===
+    def fakeTextSpeech(text, fileName):
+        open(fileName, "w").close()
+    speaker = Playback.constructSpeaker()
+    player = Playback.constructPlayer(speaker)
+    ttsPath = os.path.join(workDir, "tts") + "/"
+    def coldCache():
+        shutil.rmtree(ttsPath, ignore_errors=True)
+        tts = TTSCache(ttsPath, fakeTextSpeech, "bench")
+        Playback(player, service, ttsPath, tts, speaker)
+        return tts
+    # time until playback can start, then until every file is generated
+    results['init_cache_cold'] = best(coldCache, repeat,
+        lambda tts: tts.waitIdle())
+    def coldCacheDrain():
+        coldCache().waitIdle()
+    results['init_cache_cold_drain'] = best(coldCacheDrain, repeat)
+    tts = TTSCache(ttsPath, fakeTextSpeech, "bench")
+    pb = Playback(player, service, ttsPath, tts, speaker)
+    tts.waitIdle()
+    results['init_cache_warm'] = best(pb.init_cache, repeat)
+    results['tts_collect'] = best(tts.collect, repeat)
+
+    # === Playlist operations ===
+    pl = pb.cur
+    def plNext():
+        for i in range(OPS):
+            pl.next()
+    results['playlist_next_op'] = best(plNext, repeat) / OPS
+    def plShuffle():
+        for i in range(OPS // 10):
+            pl.shuffle()
+    results['playlist_shuffle_op'] = best(plShuffle, repeat) / (OPS // 10)
+    def pbNextPl():
+        for i in range(OPS):
+            pb.nextPl()
+    results['playback_nextpl_op'] = best(pbNextPl, repeat) / OPS
+    def pbQueueNext():
+        for i in range(OPS):
+            pb.queueNext()
+            pb.advance()
+    results['playback_queue_next_op'] = best(pbQueueNext, repeat) / OPS
+    def pbShuffle():
+        for i in range(OPS // 10):
+            pb.shuffle()
+    results['playback_shuffle_op'] = best(pbShuffle, repeat) / (OPS // 10)
+
+    # === Remote input dispatch ===
+    ecodes = remote.ecodes
+    keys = [remote.IR_MAP[cmd] for cmd in ('next', 'prev', 'left', 'right',
+        'stop', 'play')]
+    events = []
+    for i in range(OPS):
+        for value in (remote.KeyEvent.key_down, remote.KeyEvent.key_up):
+            events.append(FakeInputEvent(ecodes.EV_KEY, keys[i % len(keys)],
+                value))
+    # skip the constructor; it would go looking for real hardware
+    class BenchRemote(remote.Remote):
+        def __init__(self):
+            pass
+    rmt = BenchRemote()
+    rmt.run_dir = workDir + "/"
+    rmt.services = [pb]
+    rmt.cur_id = 0
+    rmt.parked = False
+    rmt.player = player
+    # commands record what is playing as they change it
+    rmt.snapshot = remote.Snapshot(workDir + "/" + remote.SNAPSHOT_FILE,
+        workDir + "/" + remote.SNAPSHOT_ORDER_FILE)
+    dev = FakeInputDevice(events)
+    inputs = remote.DeviceWatcher((remote.USB_IR_ID,), rmt.keyEvent)
+    inputs.devices[DEV_PATH] = dev
+    inputs.hwIds[DEV_PATH] = remote.USB_IR_ID
+    rmt.latency = remote.LatencyTracker()
+    rmt.dispatcher = remote.Dispatcher(rmt.latency)
+    rmt.moves = remote.Coalescer(rmt.applyMove)
+    rmt.actions = rmt.mkActions()
+    rmt.keymap = rmt.init_keymap()
+    rmt.repeats = {}
+    def dispatch():
+        inputs.ioEvent(dev.fd, remote.gobject.IO_IN, DEV_PATH)
+        # stand in for the main loop
+        while (rmt.dispatcher.run()):
+            pass
+        # play the net move of the final burst
+        rmt.moves.flush()
+    results['remote_dispatch_op'] = best(dispatch, repeat) / OPS
+    return results
+
+def main():
+    '''
+    Main execution point
+    '''
+    parser = argparse.ArgumentParser(description="Mood switch benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+",
+        default=sorted(LIBRARY_SIZES.keys()),
+        help="library sizes (total tracks) to run")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+        help="runs per measurement (best is reported)")
+    parser.add_argument("--output", default=None,
+        help="file to write JSON results to (default: stdout)")
+    args = parser.parse_args()
+
+    installStubs()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    report = {
+        "timestamp" : time.time(),
+        "python"    : platform.python_version(),
+        "platform"  : platform.platform(),
+        "repeat"    : args.repeat,
+        "results"   : {},
+    }
+    for size in args.sizes:
+        perPlaylist = LIBRARY_SIZES.get(size, 100)
+        workDir = tempfile.mkdtemp(prefix="mood_switch_bench_")
+        try:
+            report["results"][str(size)] = benchLibrary(workDir, size,
+                perPlaylist, args.repeat)
+        finally:
+            shutil.rmtree(workDir, ignore_errors=True)
+        print("Finished library of " + str(size) + " tracks", file=sys.stderr)
+    out = json.dumps(report, sort_keys=True, indent=4, separators=(',', ': '))
+    if (args.output != None):
+        with open(args.output, "w") as fd:
+            fd.write(out + "\n")
+    else:
+        print(out)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import threading
+# GStream object that runs music playing thread
+import gobject
+
+'''
+coalescer.py
+Python class that merges bursts of remote presses (e.g. mashing "next
+    playlist") into a single move, so that only the final target is played
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Presses less than this far apart (in ms) are part of the same burst
+COALESCE_WINDOW = 200
+
+class Coalescer:
+    '''
+    Class that adds up relative moves of the same kind (such as "+1 playlist")
+        and applies the total once no more have come in for a short while.
+        A move of a different kind settles the pending one first.
+    '''
+    def __init__(self, apply, window=COALESCE_WINDOW):
+        '''
+        Constructor
+        :param: apply Function that takes (kind, total) and performs a move
+        :param: window Time (in ms) to wait for more moves
+        '''
+        self.apply = apply
+        self.window = window
+        self.lock = threading.Lock()
+        # kind and running total of the pending move
+        self.kind = None
+        self.total = 0
+        self.timer = None
+
+    def take(self):
+        '''
+        Takes the pending move (if any), cancelling its timer. The caller must
+            hold the lock.
+        :return: Tuple of (kind, total) or None
+        '''
+        if (self.timer != None):
+            gobject.source_remove(self.timer)
+            self.timer = None
+        if (self.kind == None):
+            return None
+        move = (self.kind, self.total)
+        self.kind = None
+        self.total = 0
+        return move
+
+    def add(self, kind, delta):
+        '''
+        Adds a move to the current burst
+        :param: kind Kind of move
+        :param: delta Relative amount to move by
+        '''
+        move = None
+        with self.lock:
+            if ((self.kind != None) and (self.kind != kind)):
+                move = self.take()
+            if (self.timer != None):
+                gobject.source_remove(self.timer)
+            self.kind = kind
+            self.total += delta
+            self.timer = gobject.timeout_add(self.window, self.fire)
+        if (move != None):
+            self.apply(*move)
+
+    def flush(self):
+        '''
+        Applies the pending move right away (if there is one)
+        '''
+        with self.lock:
+            move = self.take()
+        if (move != None):
+            self.apply(*move)
+
+    def fire(self):
+        '''
+        Handles the burst ending (called from the main loop)
+        :return: False so that the timer only fires once
+        '''
+        with self.lock:
+            # the timer fired; don't try to remove it
+            self.timer = None
+            move = self.take()
+        if (move != None):
+            self.apply(*move)
+        return False
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import os
+import errno
+# Linux's evdev module, wrapped for Python
+from evdev import InputDevice, list_devices
+# GStream object that runs music playing thread
+import gobject
+# udev bindings are optional; without them missing devices are looked for
+# every RESCAN_INTERVAL seconds instead
+try:
+    import pyudev
+except ImportError:
+    pyudev = None
+
+'''
+devwatcher.py
+Python class that finds the input devices the remote is read from, and picks
+    them back up when they are unplugged and plugged back in
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Seconds between looking for missing devices (only used without pyudev)
+RESCAN_INTERVAL = 5
+# Where the kernel lists input devices (and their hardware ids)
+SYS_INPUT = "/sys/class/input/"
+
+def hwdId(vendor, product):
+    '''
+    Formats a hardware id
+    :param: vendor Vendor id
+    :param: product Product id
+    :return: vendor_id:product_id string (as is seen via lsusb and other tools)
+    '''
+    return "%04x:%04x" % (vendor, product)
+
+def sysId(path):
+    '''
+    Looks up the hardware id of an input device in sysfs (without opening the
+        device)
+    :param: path Path to the device node (such as /dev/input/event0)
+    :return: Hardware id or None if sysfs doesn't list one
+    '''
+    idPath = SYS_INPUT + os.path.basename(path) + "/device/id/"
+    try:
+        with open(idPath + "vendor", "r") as fd:
+            vendor = int(fd.read().strip(), 16)
+        with open(idPath + "product", "r") as fd:
+            product = int(fd.read().strip(), 16)
+    except (IOError, OSError, ValueError):
+        return None
+    return hwdId(vendor, product)
+
+def devId(path):
+    '''
+    Looks up the hardware id of an input device
+    :param: path Path to the device node
+    :return: Hardware id or None if the device can't be identified
+    '''
+    id = sysId(path)
+    if (id != None):
+        return id
+    # without sysfs, the device has to be opened to ask it
+    try:
+        dev = InputDevice(path)
+    except (IOError, OSError):
+        return None
+    try:
+        return hwdId(dev.info[1], dev.info[2])
+    finally:
+        dev.close()
+
+class DeviceWatcher:
+    '''
+    Class that reads input devices from the gobject main loop. Only the
+        devices being looked for are opened; they are dropped when unplugged
+        and opened again once they come back. A device may show up as more
+        than one node (such as a receiver with a keyboard and a mouse
+        interface); every one of its nodes is read.
+    '''
+    def __init__(self, ids, onEvent):
+        '''
+        Constructor
+        :param: ids Hardware ids of the devices to read
+        :param: onEvent Function to call with each input event
+        '''
+        self.ids = ids
+        self.onEvent = onEvent
+        # [device node path] -> open InputDevice, its hardware id, and the
+        # main loop source watching it
+        self.devices = {}
+        self.hwIds = {}
+        self.watches = {}
+        self.monitor = None
+        self.monitorWatch = None
+        self.timer = None
+
+    def start(self):
+        '''
+        Opens the devices that are plugged in and starts watching for the rest
+            to be plugged in
+        '''
+        if (pyudev != None):
+            self.monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            self.monitor.filter_by(subsystem="input")
+            self.monitor.start()
+            self.monitorWatch = gobject.io_add_watch(self.monitor.fileno(),
+                gobject.IO_IN, self.udevEvent)
+        self.scan()
+        for id in self.missing():
+            print("Warning: Input device " + id + " not found; waiting "
+                + "for it to be plugged in")
+        self.waitForDevices()
+
+    def missing(self):
+        '''
+        Lists the devices being looked for that have no node open
+        :return: List of hardware ids
+        '''
+        found = set(self.hwIds.values())
+        return [id for id in self.ids if not(id in found)]
+
+    def scan(self):
+        '''
+        Opens every node of the devices being looked for that is plugged in
+        '''
+        for path in list_devices():
+            if (path in self.devices):
+                continue
+            id = devId(path)
+            if (id in self.ids):
+                self.attach(id, path)
+
+    def attach(self, id, path):
+        '''
+        Opens a device and starts reading from it
+        :param: id Hardware id of the device
+        :param: path Path to the device node
+        :return: True if the device was opened, False otherwise
+        '''
+        try:
+            dev = InputDevice(path)
+        except (IOError, OSError):
+            print("Warning: Unable to open input device " + path)
+            return False
+        self.devices[path] = dev
+        self.hwIds[path] = id
+        self.watches[path] = gobject.io_add_watch(dev.fd,
+            gobject.IO_IN | gobject.IO_ERR | gobject.IO_HUP, self.ioEvent,
+            path)
+        return True
+
+    def detach(self, path):
+        '''
+        Closes a device node that has gone away and waits for it to come back
+        :param: path Path to the device node
+        '''
+        watch = self.watches.pop(path, None)
+        if (watch != None):
+            gobject.source_remove(watch)
+        dev = self.devices.pop(path, None)
+        id = self.hwIds.pop(path, None)
+        if (dev == None):
+            return
+        print("Warning: Input device " + id + " (" + path + ") was unplugged")
+        try:
+            dev.close()
+        except (IOError, OSError):
+            pass
+        self.waitForDevices()
+
+    def waitForDevices(self):
+        '''
+        Without udev to report devices being plugged in, looks for missing
+            devices every so often
+        '''
+        if ((self.monitor == None) and (self.timer == None)
+                and (len(self.missing()) > 0)):
+            self.timer = gobject.timeout_add_seconds(RESCAN_INTERVAL,
+                self.rescan)
+
+    def rescan(self):
+        '''
+        Looks for missing devices (called from the main loop)
+        :return: True to keep looking while devices are missing
+        '''
+        self.scan()
+        if (len(self.missing()) > 0):
+            return True
+        self.timer = None
+        return False
+
+    def udevEvent(self, fd, condition):
+        '''
+        Handles udev reporting devices being added or removed (called from the
+            main loop)
+        :param: fd File descriptor of the udev monitor
+        :param: condition IO condition that triggered the watch
+        :return: True to keep watching
+        '''
+        device = self.monitor.poll(timeout=0)
+        while (device != None):
+            path = device.device_node
+            if ((device.action == "add") and (path != None)
+                    and os.path.basename(path).startswith("event")):
+                id = devId(path)
+                if ((id in self.ids) and not(path in self.devices)):
+                    self.attach(id, path)
+            device = self.monitor.poll(timeout=0)
+        return True
+
+    def ioEvent(self, fd, condition, path):
+        '''
+        Handles a device being ready to read, or going away (called from the
+            main loop)
+        :param: fd File descriptor of the device
+        :param: condition IO condition that triggered the watch
+        :param: path Path to the device node
+        :return: True to keep watching the device
+        '''
+        dev = self.devices.get(path)
+        if (dev == None):
+            return False
+        if (condition & (gobject.IO_ERR | gobject.IO_HUP)):
+            # returning False removes the watch
+            self.watches.pop(path, None)
+            self.detach(path)
+            return False
+        try:
+            # reads everything that is waiting, without blocking
+            for event in dev.read():
+                self.onEvent(event)
+        except IOError as e:
+            if (e.errno != errno.EAGAIN):
+                # ENODEV once the device is unplugged
+                self.watches.pop(path, None)
+                self.detach(path)
+                return False
+        return True
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import time
+import threading
+import traceback
+try:
+    from Queue import PriorityQueue
+except ImportError:
+    from queue import PriorityQueue
+# GStream object that runs music playing thread
+import gobject
+
+'''
+dispatcher.py
+Python class that funnels commands from every thread (remote input, player
+    events) onto the gobject main loop, where they run one at a time
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Command priorities (lower runs first)
+PRIORITY_INPUT = 0
+PRIORITY_EVENT = 10
+
+class Command:
+    '''
+    Class that represents a single queued command
+    '''
+    def __init__(self, name, fn, args, priority):
+        '''
+        Constructor
+        :param: name Name of the command (for the latency histograms)
+        :param: fn Function to run
+        :param: args Tuple of arguments to the function
+        :param: priority Command priority
+        '''
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.priority = priority
+        # wall-clock times the command was queued, started and finished
+        self.enqueued = time.time()
+        self.started = None
+        self.finished = None
+
+class Dispatcher:
+    '''
+    Class that runs queued commands on the main loop, in priority order (and
+        in the order they were queued within a priority). Everything that
+        touches the playback state goes through here, so none of it needs
+        locking.
+    '''
+    def __init__(self, latency=None):
+        '''
+        Constructor
+        :param: latency (Optional) LatencyTracker to record, per command, the
+            time spent queued and the time spent running
+        '''
+        self.latency = latency
+        self.queue = PriorityQueue()
+        self.lock = threading.Lock()
+        # keeps commands with equal priority in the order they were queued
+        self.seq = 0
+        # tracks if the main loop has been asked to run the queue
+        self.scheduled = False
+
+    def post(self, name, fn, args=(), priority=PRIORITY_INPUT):
+        '''
+        Queues a command (from any thread)
+        :param: name Name of the command
+        :param: fn Function to run
+        :param: args Tuple of arguments to the function
+        :param: priority Command priority
+        :return: Command object
+        '''
+        cmd = Command(name, fn, args, priority)
+        with self.lock:
+            self.seq += 1
+            self.queue.put((priority, self.seq, cmd))
+            schedule = not(self.scheduled)
+            self.scheduled = True
+        if (schedule):
+            gobject.idle_add(self.run, priority=gobject.PRIORITY_HIGH)
+        return cmd
+
+    def run(self):
+        '''
+        Runs the next command (called from the main loop). Only one command
+            runs per call so that player events get a turn in between.
+        :return: True while there are commands left to run
+        '''
+        with self.lock:
+            if (self.queue.empty()):
+                self.scheduled = False
+                return False
+            priority, seq, cmd = self.queue.get()
+        cmd.started = time.time()
+        try:
+            cmd.fn(*cmd.args)
+        except Exception:
+            # one bad command shouldn't take the queue down with it
+            traceback.print_exc()
+        cmd.finished = time.time()
+        if (self.latency != None):
+            self.latency.add(cmd.name, "queue", cmd.started - cmd.enqueued)
+            self.latency.add(cmd.name, "run", cmd.finished - cmd.started)
+        return True
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import os
+import json
+
+'''
+jsonstore.py
+Python module that reads and writes the JSON files the player keeps on disk
+    (library index, metadata and speech caches, playback snapshot). Each file
+    records the version of its layout; a file with any other version is
+    ignored, so bumping a version discards what older code wrote.
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Byte strings are written out as latin-1, which maps every byte to one
+# character. File names don't have to be valid UTF-8 (or any other encoding),
+# and this way they still come back exactly as they were.
+JSON_ENCODING = "latin-1"
+
+def nativeStr(s):
+    '''
+    Converts (unicode) text to a native (UTF-8 byte) string, so that it can be
+        used along with file names from os.listdir()
+    :param: s String
+    :return: Native string
+    '''
+    if not(isinstance(s, str)):
+        s = s.encode("utf-8")
+    return s
+
+def fileStr(s):
+    '''
+    JSON hands back unicode strings; file names from os.listdir() are plain
+        (byte) strings. Converts a string loaded by loadJSON() back into the
+        byte string that saveJSON() was given.
+    :param: s String loaded from JSON
+    :return: Native string
+    '''
+    if not(isinstance(s, str)):
+        try:
+            s = s.encode(JSON_ENCODING)
+        except UnicodeError:
+            # saved as unicode in the first place
+            s = s.encode("utf-8")
+    return s
+
+def loadJSON(fileName, version):
+    '''
+    Reads a JSON file in from disk
+    :param: fileName Path to the file
+    :param: version Layout version the file has to have
+    :return: Dictionary stored in the file or None if the file is missing,
+        corrupt or of another version
+    '''
+    try:
+        with open(fileName, "r") as fd:
+            data = json.load(fd)
+    except (IOError, OSError, ValueError):
+        return None
+    if ((not(isinstance(data, dict))) or (data.get("version") != version)):
+        return None
+    return data
+
+def saveJSON(fileName, version, data, desc):
+    '''
+    Writes a JSON file out to disk. The file is written to a temporary
+        location first and renamed into place so that a crash never leaves a
+        partially written file behind.
+    :param: fileName Path to the file
+    :param: version Layout version to record in the file
+    :param: data Dictionary that can be serialized to JSON
+    :param: desc Description of the file, for warnings
+    :return: True if the file was written
+    '''
+    data["version"] = version
+    tmpName = fileName + ".tmp"
+    try:
+        with open(tmpName, "w") as fd:
+            json.dump(data, fd, separators=(',', ':'),
+                encoding=JSON_ENCODING)
+        os.rename(tmpName, fileName)
+    except (IOError, OSError, UnicodeError, TypeError, ValueError):
+        # a file that can't be written is rebuilt on the next start; it must
+        # never stop the start-up itself
+        print("Warning: Unable to write " + desc + " " + fileName)
+        try:
+            os.remove(tmpName)
+        except OSError:
+            pass
+        return False
+    return True
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import os
+import json
+# Linux's evdev module, wrapped for Python
+from evdev import ecodes
+
+'''
+keymap.py
+Python class that maps remote buttons, and the way they are pressed, to named
+    actions. The mapping can be loaded from a file so that a different remote
+    can be used without code edits.
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Ways a button can be pressed:
+#   tap    - released before the key starts repeating
+#   hold   - held until the key starts repeating (fires once)
+#   repeat - fires on every key repeat while held (the kernel repeats keys
+#            about 30 times a second)
+PRESS_TAP = "tap"
+PRESS_HOLD = "hold"
+PRESS_REPEAT = "repeat"
+PRESSES = (PRESS_TAP, PRESS_HOLD, PRESS_REPEAT)
+# Held buttons speed up: the step grows by one every ACCEL_REPEATS repeats
+# (about 2 seconds), up to ACCEL_MAX
+ACCEL_REPEATS = 60
+ACCEL_MAX = 4
+
+def accelerate(count, every):
+    '''
+    Works out how far a repeat of a held button should move. Only every few
+        repeats move, and they move further the longer the button is held.
+    :param: count Number of times the key has repeated
+    :param: every Number of repeats between moves
+    :return: Number of steps to move (0 for repeats that don't move)
+    '''
+    if ((count % every) != 0):
+        return 0
+    return min(1 + (count // ACCEL_REPEATS), ACCEL_MAX)
+
+def keyCode(name):
+    '''
+    Looks up a key code
+    :param: name evdev key name (such as "KEY_UP") or key code number
+    :return: Key code or None if the key is unknown
+    '''
+    if (name.isdigit()):
+        return int(name)
+    if not(name.startswith("KEY_") or name.startswith("BTN_")):
+        return None
+    code = getattr(ecodes, name, None)
+    if not(isinstance(code, int)):
+        return None
+    return code
+
+class Keymap:
+    '''
+    Class that holds the table of (key code, press type) -> action name
+    '''
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.table = {}
+
+    def bind(self, code, press, action):
+        '''
+        Maps a button press to an action
+        :param: code Key code
+        :param: press Type of press (tap, hold or repeat)
+        :param: action Name of the action
+        '''
+        self.table[code, press] = action
+
+    def lookup(self, code, press):
+        '''
+        Looks up the action of a button press
+        :param: code Key code
+        :param: press Type of press
+        :return: Name of the action or None if the press does nothing
+        '''
+        return self.table.get((code, press))
+
+    def load(self, fileName, actions):
+        '''
+        Replaces the mappings with those in a keymap file. The file is a JSON
+            object of key name -> { press type : action name }, for example:
+            { "KEY_RIGHT" : { "tap" : "nextTrack", "repeat" : "seekForward" } }
+        :param: fileName Path to the keymap file
+        :param: actions Names of the actions that can be mapped to
+        :return: True if the file was loaded, False if the current mappings
+            were kept (the file is missing or unreadable)
+        '''
+        if not(os.path.exists(fileName)):
+            return False
+        try:
+            with open(fileName, "r") as fd:
+                data = json.load(fd)
+        except (IOError, OSError, ValueError):
+            print("Warning: Unable to read keymap " + fileName)
+            return False
+        if not(isinstance(data, dict)):
+            print("Warning: Keymap " + fileName + " is not a JSON object")
+            return False
+        table = {}
+        for name, presses in data.items():
+            code = keyCode(name)
+            if ((code == None) or not(isinstance(presses, dict))):
+                print("Warning: Skipping keymap entry " + name)
+                continue
+            for press, action in presses.items():
+                if not((press in PRESSES) and isinstance(action,
+                        (str, type(u""))) and (action in actions)):
+                    print("Warning: Skipping keymap entry " + name + " "
+                        + press)
+                    continue
+                table[code, press] = action
+        self.table = table
+        return True
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import json
+import time
+# GStreamer
+import pygst
+import gst
+
+'''
+latency.py
+Python classes that measure how long remote commands take, from the button
+    being released to the music being heard, and keep histograms of it
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Number of histogram buckets. Bucket 0 holds times under 1ms; bucket n holds
+# times from 2^(n-1) up to 2^n ms (the last bucket holds everything slower).
+BUCKETS = 16
+# Stages of a command, in order. Every stage is timed from the key-up event:
+#   input    - the remote picks up the event
+#   dispatch - the command has been run
+#   buffer   - the first buffer of the new stream reaches the audio sink
+#   state    - the player reaches the playing state
+# Commands run through the dispatcher also record (not from key-up):
+#   queue    - time spent waiting for the main loop
+#   run      - time spent running
+STAGES = ("input", "dispatch", "buffer", "state", "queue", "run")
+
+class Histogram:
+    '''
+    Class that counts times in (base 2) logarithmic buckets of milliseconds
+    '''
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        # in seconds
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        '''
+        Records a time
+        :param: seconds Time in seconds
+        '''
+        ms = max(int(seconds * 1000), 0)
+        self.counts[min(ms.bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @staticmethod
+    def label(bucket):
+        '''
+        Builds the label of a bucket
+        :param: bucket Bucket index
+        :return: Range of the bucket, in ms
+        '''
+        if (bucket == 0):
+            return "<1"
+        if (bucket == (BUCKETS - 1)):
+            return ">=" + str(1 << (bucket - 1))
+        return str(1 << (bucket - 1)) + "-" + str(1 << bucket)
+
+    def record(self):
+        '''
+        Builds a structured record of the histogram
+        :return: Dictionary that can be serialized to JSON
+        '''
+        return {
+            "count"     : self.count,
+            "mean_ms"   : (self.total * 1000) / max(self.count, 1),
+            "max_ms"    : self.max * 1000,
+            "buckets"   : dict((Histogram.label(bucket), count)
+                for bucket, count in enumerate(self.counts) if (count > 0)),
+        }
+
+    def __str__(self):
+        '''
+        __str__
+        :return: One line summary of the histogram
+        '''
+        bucketStr = ", ".join("%sms: %d" % (Histogram.label(bucket), count)
+            for bucket, count in enumerate(self.counts) if (count > 0))
+        return "n=%d mean=%.1fms max=%.1fms [ %s ]" % (self.count,
+            (self.total * 1000) / max(self.count, 1), self.max * 1000,
+            bucketStr)
+
+class LatencyTracker:
+    '''
+    Class that follows one command at a time through its stages and keeps a
+        histogram per command and stage. Starting a new command abandons the
+        stages the previous one had yet to reach.
+    '''
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        # [command] -> [stage] -> Histogram
+        self.hists = {}
+        # [command, key-up time, stages still to come] of the command in
+        # flight. Replaced (never modified in place) as stages are reached,
+        # since the player reports them from other threads.
+        self.pending = None
+
+    def add(self, command, stage, seconds):
+        '''
+        Records the time a command took to reach a stage
+        :param: command Name of the command
+        :param: stage Name of the stage
+        :param: seconds Time since the key-up event
+        '''
+        hists = self.hists.setdefault(command, {})
+        if not(stage in hists):
+            hists[stage] = Histogram()
+        hists[stage].add(seconds)
+
+    def start(self, command, keyTime):
+        '''
+        Marks a command as picked up by the remote
+        :param: command Name of the command
+        :param: keyTime Time of the key-up event (seconds since the epoch)
+        '''
+        self.add(command, "input", time.time() - keyTime)
+        self.pending = [command, keyTime, ()]
+
+    def reached(self, stage):
+        '''
+        Marks a stage of the command in flight as reached
+        :param: stage Name of the stage
+        '''
+        pending = self.pending
+        if ((pending == None) or not(stage in pending[2])):
+            return
+        self.add(pending[0], stage, time.time() - pending[1])
+        stages = tuple(s for s in pending[2] if (s != stage))
+        if (len(stages) > 0):
+            self.pending = [pending[0], pending[1], stages]
+        else:
+            self.pending = None
+
+    def dispatched(self, commands=None):
+        '''
+        Marks the command in flight as run. From here on, the player is
+            watched for the new stream and the playing state.
+        :param: commands (Optional) Only mark the command in flight if it is
+            one of these
+        '''
+        pending = self.pending
+        if ((pending == None) or
+                ((commands != None) and not(pending[0] in commands))):
+            return
+        self.add(pending[0], "dispatch", time.time() - pending[1])
+        # the first buffer only counts once a new stream has started
+        self.pending = [pending[0], pending[1], ("segment", "state")]
+
+    def watch(self, player):
+        '''
+        Watches a music player's audio sink for the first buffer of each new
+            stream
+        :param: player GST Player object
+        '''
+        pad = player.get_property("audio-sink").get_pad("sink")
+        pad.add_data_probe(self.dataProbe)
+
+    def dataProbe(self, pad, data):
+        '''
+        Handles data flowing into the audio sink (runs on a streaming thread;
+            returns right away unless a command is waiting on its stream)
+        :param: pad Sink pad
+        :param: data Buffer or event
+        :return: True to let the data through
+        '''
+        pending = self.pending
+        if (pending == None):
+            return True
+        if (isinstance(data, gst.Event)):
+            if ((data.type == gst.EVENT_NEWSEGMENT)
+                    and ("segment" in pending[2])):
+                self.pending = [pending[0], pending[1], tuple(
+                    "buffer" if (s == "segment") else s for s in pending[2])]
+        elif ("buffer" in pending[2]):
+            self.reached("buffer")
+        return True
+
+    def stateChanged(self, message):
+        '''
+        Handles a state change message from the music player
+        :param: message Message object from the player's bus
+        '''
+        old, new, pending = message.parse_state_changed()
+        if (new == gst.STATE_PLAYING):
+            self.reached("state")
+
+    def record(self):
+        '''
+        Builds a structured record of all histograms
+        :return: Dictionary that can be serialized to JSON
+        '''
+        return {
+            "timestamp" : time.time(),
+            "commands"  : dict((command, dict((stage, hist.record())
+                for stage, hist in hists.items()))
+                for command, hists in self.hists.items()),
+        }
+
+    def __str__(self):
+        '''
+        __str__
+        :return: One line per command and stage
+        '''
+        lines = []
+        for command in sorted(self.hists.keys()):
+            for stage in STAGES:
+                if (stage in self.hists[command]):
+                    lines.append("%s/%s: %s" % (command, stage,
+                        self.hists[command][stage]))
+        return "\n".join(lines)
+
+    def log(self, fileName=None):
+        '''
+        Prints the histograms and, if a file is provided, appends them to it
+            as one line of JSON
+        :param: fileName (Optional) Path to the log file
+        '''
+        print(str(self))
+        if (fileName == None):
+            return
+        try:
+            with open(fileName, "a") as fd:
+                fd.write(json.dumps(self.record(), sort_keys=True) + "\n")
+        except (IOError, OSError):
+            print("Warning: Unable to write latency log " + fileName)
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
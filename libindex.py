@@ -0,0 +1,125 @@
+#/usr/bin/python
+from __future__ import print_function
+# Local imports
+from jsonstore import fileStr, loadJSON, saveJSON
+
+'''
+libindex.py
+Python class that persists a listing of the local music library to disk so
+    that unchanged playlists do not have to be re-scanned on every start
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Layout version of the index file (see jsonstore.py)
+INDEX_VERSION = 3
+
+class LibraryIndex:
+    '''
+    Class that represents the on-disk index of a local music library
+        The index maps a playlist (an entry in the music directory) to the
+        list of tracks found in it, along with the modification times of the
+        files and directories that list depends on.
+    '''
+    def __init__(self, fileName):
+        '''
+        Constructor
+        :param: fileName Path to the index file
+        '''
+        self.fileName = fileName
+        # modification time of the top level music directory
+        self.root_mtime = None
+        # [playlist name] -> [{path: mtime}, [track names]]
+        self.playlists = {}
+        # tracks if anything needs to be written back out
+        self.dirty = False
+
+    def load(self):
+        '''
+        Reads the index in from disk. A missing or corrupt index is treated
+            as an empty one.
+        :return: True if an index was loaded, False otherwise
+        '''
+        data = loadJSON(self.fileName, INDEX_VERSION)
+        if (data == None):
+            return False
+        self.root_mtime = data.get("root_mtime")
+        self.playlists = {}
+        for name, entry in data.get("playlists", {}).items():
+            deps = {}
+            for path, mtime in entry[0].items():
+                deps[fileStr(path)] = mtime
+            tracks = [fileStr(track) for track in entry[1]]
+            self.playlists[fileStr(name)] = [deps, tracks]
+        self.dirty = False
+        return True
+
+    def save(self):
+        '''
+        Writes the index out to disk (only if something has changed)
+        '''
+        if not(self.dirty):
+            return
+        if (saveJSON(self.fileName, INDEX_VERSION, {
+                    "root_mtime"    : self.root_mtime,
+                    "playlists"     : self.playlists,
+                }, "library index")):
+            self.dirty = False
+
+    def names(self):
+        '''
+        Returns the playlist names stored in the index
+        :return: List of playlist names
+        '''
+        return self.playlists.keys()
+
+    def lookup(self, name):
+        '''
+        Looks up the tracks of a playlist. It is up to the caller to check
+            that the dependencies have not changed.
+        :param: name Name of the playlist (entry in the music directory)
+        :return: Tuple of ({path: mtime}, [track names]) or None if missing
+        '''
+        entry = self.playlists.get(name)
+        if (entry == None):
+            return None
+        return (entry[0], entry[1])
+
+    def update(self, name, deps, tracks):
+        '''
+        Stores the tracks of a playlist
+        :param: name Name of the playlist (entry in the music directory)
+        :param: deps Dictionary of paths the listing depends on (relative to
+            the music directory) -> modification time
+        :param: tracks List of track names
+        '''
+        self.playlists[name] = [deps, tracks]
+        self.dirty = True
+
+    def setRoot(self, mtime):
+        '''
+        Records the modification time of the top level music directory
+        :param: mtime Modification time of the music directory
+        '''
+        if (self.root_mtime != mtime):
+            self.root_mtime = mtime
+            self.dirty = True
+
+    def prune(self, names):
+        '''
+        Drops any playlists from the index that are not in a set of names
+        :param: names Collection of playlist names to keep
+        '''
+        keep = set(names)
+        for name in self.playlists.keys():
+            if not(name in keep):
+                del self.playlists[name]
+                self.dirty = True
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import os
+import stat
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+# scandir() reads directory entries along with their file types in a single
+# pass; it is built-in as of Python 3.5 and available as a backport before that
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+'''
+libscanner.py
+Python class that scans the local music directory for playlists and tracks.
+    Playlists are read in parallel, one pass per directory.
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Tuple of file types that GStreamer can play (that I know of thus far)
+FILE_TYPES = ('.mp3', '.ogg', '.wav')
+# Number of directories to read concurrently. Scanning is bound by storage
+# latency, not by the CPU, so more threads than cores are worth having.
+try:
+    DEFAULT_WORKERS = multiprocessing.cpu_count() * 2
+except NotImplementedError:
+    DEFAULT_WORKERS = 4
+
+def listEntries(path):
+    '''
+    Lists a directory, including whether each entry is a file or directory.
+        With scandir() available, the type comes from the directory entry
+        itself and no extra stat() call is needed per entry.
+    :param: path Path to the directory
+    :return: List of (name, isFile, isDir) tuples
+    '''
+    entries = []
+    if (scandir != None):
+        for entry in scandir(path):
+            entries.append((entry.name, entry.is_file(), entry.is_dir()))
+        return entries
+    # otherwise, a single stat() per entry answers both questions
+    for name in os.listdir(path):
+        try:
+            mode = os.stat(os.path.join(path, name)).st_mode
+        except OSError:
+            # broken link or entry removed since listing
+            entries.append((name, False, False))
+            continue
+        entries.append((name, stat.S_ISREG(mode), stat.S_ISDIR(mode)))
+    return entries
+
+def listTracks(pl_path):
+    '''
+    Reads a playlist directory once and collects the playable tracks in it
+    :param: pl_path Path to the playlist directory
+    :return: Sorted list of track names
+    '''
+    tracks = []
+    for name, isFile, isDir in listEntries(pl_path):
+        # tracks are files in a directory
+        if ((isFile) and (name.endswith(FILE_TYPES))):
+            tracks.append(name)
+    tracks.sort()
+    return tracks
+
+class LibraryScanner:
+    '''
+    Class that scans a music directory for playlists. Every entry in the top
+        level of the music directory that a playlist source recognizes is a
+        playlist, for example:
+            [Top Level Path]
+            |-- Playlist 0
+                |-- Song 0
+                |-- Song 1
+            |-- Playlist 1
+                |-- Song 0
+            |-- Playlist 2.m3u
+            etc...
+    '''
+    def __init__(self, path, sources, index=None, workers=DEFAULT_WORKERS):
+        '''
+        Constructor
+        :param: path Path to directory storing local music
+        :param: sources List of PlaylistSource objects, tried in order
+        :param: index (Optional) LibraryIndex used to skip unchanged playlists
+        :param: workers Number of playlists to read concurrently
+        '''
+        self.path = path
+        self.sources = sources
+        self.index = index
+        self.workers = workers
+
+    def sourceFor(self, name, isFile, isDir):
+        '''
+        Finds the source that handles an entry in the music directory
+        :param: name Name of the entry
+        :param: isFile True if the entry is a regular file
+        :param: isDir True if the entry is a directory
+        :return: PlaylistSource or None if the entry is not a playlist
+        '''
+        for source in self.sources:
+            if (source.match(name, isFile, isDir)):
+                return source
+        return None
+
+    def listPlaylists(self):
+        '''
+        Lists the candidate playlist names in the top level music directory.
+            If the directory has not changed since the index was written, the
+            listing is taken from the index.
+        :return: List of entry names in the music directory
+        '''
+        if (self.index != None):
+            root_mtime = os.stat(self.path).st_mtime
+            if (self.index.root_mtime == root_mtime):
+                return self.index.names()
+        names = [name for name, isFile, isDir in listEntries(self.path)
+            if (self.sourceFor(name, isFile, isDir) != None)]
+        if (self.index != None):
+            self.index.setRoot(root_mtime)
+            self.index.prune(names)
+        return names
+
+    def isCurrent(self, deps):
+        '''
+        Checks that none of the dependencies of a cached listing have changed
+        :param: deps Dictionary of paths (relative to the music directory) ->
+            modification time
+        :return: True if the listing can be used as-is
+        '''
+        try:
+            for path, mtime in deps.items():
+                if (os.stat(os.path.join(self.path, path)).st_mtime != mtime):
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def lookupPlaylist(self, name):
+        '''
+        Looks up a playlist without reading it. This settles entries that are
+            not playlists, and playlists that the index has a current
+            listing of.
+        :param: name Name of the playlist (entry in the music directory)
+        :return: Tuple as returned by scanPlaylist(), or None if the playlist
+            has to be read
+        '''
+        try:
+            pl_stat = os.stat(os.path.join(self.path, name))
+        except OSError:
+            return (name, None, None, None, False)
+        source = self.sourceFor(name, stat.S_ISREG(pl_stat.st_mode),
+            stat.S_ISDIR(pl_stat.st_mode))
+        if (source == None):
+            return (name, None, None, None, False)
+        if (self.index != None):
+            cached = self.index.lookup(name)
+            if ((cached != None) and (self.isCurrent(cached[0]))):
+                return (name, source, cached[0], cached[1], False)
+        return None
+
+    def scanPlaylist(self, name, force=False):
+        '''
+        Retrieves the track names of a single playlist, using the index when
+            nothing it depends on has been modified
+        :param: name Name of the playlist (entry in the music directory)
+        :param: force If True, always read the playlist (ignore the index)
+        :return: Tuple of (name, source, deps, tracks, isFresh). Tracks is
+            None if the entry is not a playlist. isFresh is True if the
+            playlist had to be read (rather than coming from the index).
+        '''
+        if not(force):
+            result = self.lookupPlaylist(name)
+            if (result != None):
+                return result
+        try:
+            pl_stat = os.stat(os.path.join(self.path, name))
+        except OSError:
+            return (name, None, None, None, False)
+        source = self.sourceFor(name, stat.S_ISREG(pl_stat.st_mode),
+            stat.S_ISDIR(pl_stat.st_mode))
+        if (source == None):
+            return (name, None, None, None, False)
+        try:
+            deps, tracks = source.scan(self.path, name)
+        except (IOError, OSError):
+            return (name, None, None, None, False)
+        return (name, source, deps, tracks, True)
+
+    def scan(self):
+        '''
+        Scans the music directory, fanning playlists out across a pool of
+            threads
+        :return: List of (playlist name, source, dependencies,
+            [track names]) in sorted order. Empty playlists are left out.
+        '''
+        names = sorted(self.listPlaylists())
+        # playlists the index has a current listing of only cost a stat() per
+        # dependency. Only the rest are read across the pool, which takes a
+        # while to wind down and so isn't started for nothing.
+        results = {}
+        if (self.index != None):
+            for name in names:
+                result = self.lookupPlaylist(name)
+                if (result != None):
+                    results[name] = result
+        stale = [name for name in names if not(name in results)]
+        readPlaylist = lambda name: self.scanPlaylist(name, True)
+        if ((self.workers > 1) and (len(stale) > 1)):
+            pool = ThreadPool(min(self.workers, len(stale)))
+            try:
+                scanned = pool.map(readPlaylist, stale)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            scanned = [readPlaylist(name) for name in stale]
+        for result in scanned:
+            results[result[0]] = result
+        playlists = []
+        for name in names:
+            name, source, deps, tracks, isFresh = results[name]
+            if (tracks == None):
+                continue
+            # only the main thread touches the index
+            if ((isFresh) and (self.index != None)):
+                self.index.update(name, deps, tracks)
+            # skip if the playlist is empty
+            if (len(tracks) > 0):
+                playlists.append((name, source, deps, tracks))
+        if (self.index != None):
+            self.index.save()
+        return playlists
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+    from plsources import DEFAULT_SOURCES
+    scanner = LibraryScanner("local_music", DEFAULT_SOURCES)
+    for name, source, deps, tracks in scanner.scan():
+        print(name + ": " + str(tracks))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import os
+# GStream object that runs music playing thread
+import gobject
+# inotify bindings are optional; without them the library is only scanned on
+# start-up
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+'''
+libwatcher.py
+Python class that watches the local music directory for changes (via inotify)
+    and applies them to a running LocalService
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Copying an album in produces a burst of events; wait this long (in ms) after
+# the last event for a playlist before re-scanning it
+SETTLE_TIME = 1000
+
+class LibraryWatcher:
+    '''
+    Class that watches a LocalService's music directory from the gobject main
+        loop. Changes to a playlist are batched up and applied once it
+        settles.
+    '''
+    def __init__(self, service, onChange=None):
+        '''
+        Constructor
+        :param: service Reference to the LocalService to keep up to date
+        :param: onChange (Optional) Function to call after the service's
+            playlists have changed
+        '''
+        self.service = service
+        self.onChange = onChange
+        self.path = os.path.abspath(service.path)
+        # playlist names with changes that have yet to be applied
+        self.dirty = set()
+        # (old name, new name) pairs of renamed playlists
+        self.renames = []
+        self.timer = None
+        self.wm = None
+        self.mask = None
+        # [playlist name] -> {absolute path: watch descriptor}
+        self.watches = {}
+        self.notifier = None
+        self.io_watch = None
+
+    def start(self):
+        '''
+        Starts watching the music directory
+        :return: True if the watch was set up, False otherwise
+        '''
+        if (pyinotify == None):
+            print("Warning: pyinotify not found; library changes require a "
+                + "restart")
+            return False
+        self.mask = (pyinotify.IN_CREATE | pyinotify.IN_DELETE
+            | pyinotify.IN_MOVED_FROM | pyinotify.IN_MOVED_TO
+            | pyinotify.IN_CLOSE_WRITE)
+        self.wm = pyinotify.WatchManager()
+        self.notifier = pyinotify.Notifier(self.wm, self.inotifyEvent,
+            timeout=0)
+        # watch the top level (playlists), and the directories the scan found
+        # each playlist depends on (tracks). Walking the tree again here
+        # would cost a stat() per file on every start.
+        if (self.addWatch(self.path) == None):
+            return False
+        for name in self.service.deps.keys():
+            self.watchPlaylist(name)
+        # hand the inotify file descriptor to the main loop instead of polling
+        self.io_watch = gobject.io_add_watch(self.wm.get_fd(),
+            gobject.IO_IN, self.ioEvent)
+        return True
+
+    def stop(self):
+        '''
+        Stops watching the music directory
+        '''
+        if (self.io_watch != None):
+            gobject.source_remove(self.io_watch)
+            self.io_watch = None
+        if (self.timer != None):
+            gobject.source_remove(self.timer)
+            self.timer = None
+        if (self.notifier != None):
+            self.notifier.stop()
+            self.notifier = None
+
+    def addWatch(self, path):
+        '''
+        Starts watching a single file or directory
+        :param: path Absolute path to watch
+        :return: Watch descriptor or None if the path can't be watched
+        '''
+        try:
+            wd = self.wm.add_watch(path, self.mask, rec=False,
+                quiet=False).get(path)
+        except pyinotify.WatchManagerError:
+            # most likely out of watches (see fs.inotify.max_user_watches)
+            print("Warning: Unable to watch " + path + " for library changes")
+            return None
+        if ((wd == None) or (wd < 0)):
+            return None
+        return wd
+
+    def watchPlaylist(self, name):
+        '''
+        Brings the watches of a playlist in line with what its listing
+            depends on (after it has been added, changed, renamed or removed)
+        :param: name Name of the playlist (entry in the music directory)
+        '''
+        watches = self.watches.pop(name, {})
+        paths = set()
+        for dep in self.service.deps.get(name, []):
+            path = os.path.join(self.path, dep)
+            # playlist files sit in the music directory, which is already
+            # watched
+            if ((dep == name) and not(os.path.isdir(path))):
+                continue
+            paths.add(path)
+        for path, wd in watches.items():
+            if not(path in paths):
+                # quiet, as the directory may already be gone
+                self.wm.rm_watch(wd, quiet=True)
+                del watches[path]
+        for path in paths:
+            if not(path in watches):
+                wd = self.addWatch(path)
+                if (wd != None):
+                    watches[path] = wd
+        if (len(watches) > 0):
+            self.watches[name] = watches
+
+    def ioEvent(self, fd, condition):
+        '''
+        Handles the inotify file descriptor becoming readable
+        :param: fd File descriptor
+        :param: condition gobject IO condition
+        :return: True to keep the watch alive
+        '''
+        self.notifier.read_events()
+        self.notifier.process_events()
+        return True
+
+    def playlistName(self, pathname):
+        '''
+        Maps a path inside the music directory to the name of the playlist it
+            belongs to
+        :param: pathname Absolute path of the changed file or directory
+        :return: Playlist name or None if the path is not inside a playlist
+        '''
+        rel = os.path.relpath(pathname, self.path)
+        if (rel.startswith(os.pardir)):
+            return None
+        name = rel.split(os.sep)[0]
+        if (name == os.curdir):
+            return None
+        return name
+
+    def inotifyEvent(self, event):
+        '''
+        Handles a single inotify event by marking the affected playlist
+        :param: event pyinotify event
+        '''
+        name = self.playlistName(event.pathname)
+        if (name == None):
+            return
+        # a playlist renamed within the music directory
+        src = getattr(event, "src_pathname", None)
+        if ((event.mask & pyinotify.IN_MOVED_TO)
+                and (src != None)
+                and (os.path.dirname(event.pathname) == self.path)):
+            old = self.playlistName(src)
+            if (old != None):
+                self.renames.append((old, name))
+                self.dirty.discard(old)
+        else:
+            self.dirty.add(name)
+        # (re)start the settle timer
+        if (self.timer != None):
+            gobject.source_remove(self.timer)
+        self.timer = gobject.timeout_add(SETTLE_TIME, self.apply)
+
+    def apply(self):
+        '''
+        Applies all pending changes to the service
+        :return: False so that the timer only fires once
+        '''
+        self.timer = None
+        changed = False
+        for old, new in self.renames:
+            if (self.service.renamePlaylist(old, new) != None):
+                changed = True
+            self.dirty.discard(new)
+            # the watches were set up under the old paths
+            self.watchPlaylist(old)
+            self.watchPlaylist(new)
+        for name in sorted(self.dirty):
+            if (self.service.refreshPlaylist(name) != None):
+                changed = True
+            # new sub-directories (or a new playlist) need watching
+            self.watchPlaylist(name)
+        self.renames = []
+        self.dirty = set()
+        if ((changed) and (self.onChange != None)):
+            self.onChange()
+        return False
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
@@ -3,10 +3,17 @@ from __future__ import print_function
 # Python standard lib imports
 import os
 from os.path import *
+# GStream object that runs music playing thread
+import gobject
 # Local imports
 from musicservice import MusicService
 from playlist import Playlist
 from track import Track
+from libindex import LibraryIndex
+from libscanner import LibraryScanner
+from plsources import DEFAULT_SOURCES
+from metadata import MetadataCache
+from prefetch import Prefetcher, PREFETCH_TRACKS
 
 '''
 localmusic.py
@@ -15,14 +22,16 @@ Python file that manages playing songs on local disk
 '''
 __author__ = "Schuyler Martin"
 
-# Tuple of file types that GStreamer can play (that I know of thus far)
-FILE_TYPES = ('.mp3', '.ogg', '.wav')
+# Name of the library index file (stored in the cache directory)
+INDEX_FILE = "local_library.idx"
+# Name of the track metadata cache file (stored in the cache directory)
+METADATA_FILE = "local_metadata.idx"
 
 class LocalService(MusicService):
     '''
     Music Service class that handles local files
     '''
-    def __init__(self, path):
+    def __init__(self, path, cachePath=None, lazy=False, sources=None):
         '''
         Constructor
         :param: path Path to directory storing local music
@@ -33,7 +42,19 @@ class LocalService(MusicService):
                     |-- Song 1
                 |-- Playlist 1
                     |-- Song 0
+                |-- Playlist 2.m3u
                 etc...
+        :param: cachePath (Optional) Path to caching information. If provided,
+            the library listing is persisted there and only directories that
+            have changed since the last start are re-scanned. Track metadata
+            (tags and durations) is also cached there and brought up to date
+            in the background.
+        :param: lazy If True, only the playlist names are built up front. The
+            tracks and stream locations of a playlist are built the first time
+            that playlist is played.
+        :param: sources (Optional) List of PlaylistSource objects that decide
+            which entries in the music directory are playlists (defaults to
+            playlist files and recursive directories)
         '''
         MusicService.__init__(self, "Local Service", "playlist")
         self.path = path
@@ -42,30 +63,265 @@ class LocalService(MusicService):
         # locations of song files per playlist 
         # (i.e. streams[playlist_id,song_id])
         self.streams = {}
-        pl_id = 0
-        # sort playlist orderings
-        for dir in sorted(os.listdir(self.path)):
-            # directories indicate playlists
-            pl_path = os.path.join(self.path, dir)
-            if (os.path.isdir(pl_path)):
-                track_id = 0
-                tracks = []
-                # skip if the directory is empty
-                if not(os.listdir(pl_path)):
-                    continue
-                # iterate in sorted order
-                for track in sorted(os.listdir(pl_path)):
-                    # tracks are files in a directory
-                    track_path = os.path.join(pl_path, track)
-                    if ((os.path.isfile(track_path)) and 
-                            (track_path.endswith(FILE_TYPES))):
-                        tracks.append(Track(track_id, track))
-                        stream_uri = "file://" + os.path.abspath(track_path)
-                        self.streams[pl_id,track_id] = stream_uri 
-                        track_id += 1
-                # construct final playlist
-                self.playlists[pl_id] = Playlist(pl_id, dir, tracks)
-                pl_id += 1
+        # on-disk copy of the library listing
+        self.index = None
+        # tags and durations of tracks, by path
+        self.metadata = None
+        if (cachePath != None):
+            self.index = LibraryIndex(cachePath + INDEX_FILE)
+            self.index.load()
+            self.metadata = MetadataCache(cachePath + METADATA_FILE)
+        self.lazy = lazy
+        # track names of playlists that have not been built yet
+        self.pending = {}
+        # [playlist entry name] -> playlist_id
+        self.ids = {}
+        # [playlist_id] -> directory that track names are relative to
+        self.bases = {}
+        # [playlist entry name] -> paths (relative to the music directory)
+        # that the playlist's listing depends on; what the library watcher
+        # watches
+        self.deps = {}
+        # [playlist_id] -> artist shared by the playlist's tracks (only for
+        # playlists that have one). Worked out as metadata comes in.
+        self.artists = {}
+        if (sources == None):
+            sources = DEFAULT_SOURCES
+        self.scanner = LibraryScanner(self.path, sources, self.index)
+        # warms the page cache for the songs coming up
+        self.prefetcher = Prefetcher()
+        # playlists come back in sorted order
+        for pl_id, (name, source, deps, tracks) in enumerate(
+                self.scanner.scan()):
+            self.mkPlaylist(pl_id, name, source, tracks)
+            self.deps[name] = list(deps.keys())
+        # id handed out to the next playlist added while running
+        self.next_id = len(self.playlists)
+        # only new or changed files get parsed. The cache is loaded and the
+        # track paths are built in the background too.
+        if (self.metadata != None):
+            self.metadata.refreshAsync(self.trackPaths, self.metadataReady)
+
+    def mkPlaylist(self, pl_id, name, source, tracks):
+        '''
+        Registers a playlist with this service
+        :param: pl_id Playlist unique id
+        :param: name Name of the playlist entry in the music directory
+        :param: source PlaylistSource that handles the entry
+        :param: tracks List of track names
+        '''
+        self.bases[pl_id] = source.baseDir(self.path, name)
+        title = source.title(name)
+        if (self.lazy):
+            self.pending[pl_id] = tracks
+            self.playlists[pl_id] = Playlist(pl_id, title, None,
+                self.loadPlaylist)
+        else:
+            self.playlists[pl_id] = Playlist(pl_id, title,
+                self.mkTracks(pl_id, tracks))
+        self.ids[name] = pl_id
+
+    def mkTracks(self, pl_id, tracks):
+        '''
+        Builds the track objects and stream locations of a playlist
+        :param: pl_id Playlist unique id
+        :param: tracks List of track names
+        :return: List of track objects
+        '''
+        track_objs = []
+        for track_id, track in enumerate(tracks):
+            track_path = self.trackPath(pl_id, track)
+            track_objs.append(Track(track_id, track,
+                self.getMetadata(track_path)))
+            stream_uri = "file://" + track_path
+            self.streams[pl_id,track_id] = stream_uri 
+        return track_objs
+
+    def trackPath(self, pl_id, track):
+        '''
+        Builds the absolute path to a track
+        :param: pl_id Playlist unique id
+        :param: track Name of the track (relative to the playlist's base
+            directory, or absolute)
+        :return: Absolute path to the track file
+        '''
+        return os.path.abspath(os.path.join(self.bases[pl_id], track))
+
+    def trackNames(self, playlist):
+        '''
+        Lists the track names of a playlist without building it
+        :param: playlist Reference to Playlist object
+        :return: List of track names
+        '''
+        if (playlist.isLoaded):
+            return [track.name for track in playlist.tracks]
+        return self.pending.get(playlist.id, [])
+
+    def trackPaths(self):
+        '''
+        Lists the paths to every track known to this service
+        :return: List of absolute paths
+        '''
+        paths = []
+        for pl in list(self.playlists.values()):
+            for track in self.trackNames(pl):
+                paths.append(self.trackPath(pl.id, track))
+        return paths
+
+    def getMetadata(self, path):
+        '''
+        Looks up the cached metadata of a track (no disk access)
+        :param: path Absolute path to the track file
+        :return: Metadata dictionary or None if unknown
+        '''
+        if (self.metadata == None):
+            return None
+        return self.metadata.lookup(path)
+
+    def mkArtist(self, playlist):
+        '''
+        Works out (and records) the artist of a playlist. If the playlist's
+            announcement changes as a result, it is dropped so that it is
+            rebuilt the next time it is needed.
+        :param: playlist Reference to Playlist object
+        '''
+        artists = set()
+        for track in self.trackNames(playlist):
+            meta = self.getMetadata(self.trackPath(playlist.id, track))
+            if ((meta != None) and ('artist' in meta)):
+                artists.add(meta['artist'])
+        artist = None
+        if (len(artists) == 1):
+            artist = artists.pop()
+        if (artist == self.artists.get(playlist.id)):
+            return
+        if (artist == None):
+            self.artists.pop(playlist.id, None)
+        else:
+            self.artists[playlist.id] = artist
+        playlist.ttsFile = None
+
+    def metadataReady(self, paths):
+        '''
+        Called from the background once the metadata cache has been loaded
+            and refreshed. The playlists belong to the main loop, so the
+            metadata is handed to them from there.
+        :param: paths List of paths that were (re-)parsed
+        '''
+        gobject.idle_add(self.applyMetadata, paths)
+
+    def applyMetadata(self, paths):
+        '''
+        Hands the metadata to tracks that have already been built and works
+            out the artist of every playlist (called from the main loop; see
+            metadataReady())
+        :param: paths List of paths that were (re-)parsed
+        :return: False so that it only runs once
+        '''
+        for pl in list(self.playlists.values()):
+            if (pl.isLoaded):
+                for track in pl.tracks:
+                    path = self.trackPath(pl.id, track.name)
+                    track.meta = self.getMetadata(path)
+            self.mkArtist(pl)
+        return False
+
+    def loadPlaylist(self, playlist):
+        '''
+        Loader for lazily built playlists; called the first time a playlist
+            is played
+        :param: playlist Reference to Playlist object to build
+        :return: List of track objects
+        '''
+        tracks = self.pending.pop(playlist.id)
+        return self.mkTracks(playlist.id, tracks)
+
+    def dropStreams(self, playlist):
+        '''
+        Forgets the stream locations of a playlist
+        :param: playlist Reference to Playlist object
+        '''
+        self.pending.pop(playlist.id, None)
+        if (playlist.isLoaded):
+            for track in playlist.tracks:
+                self.streams.pop((playlist.id, track.id), None)
+
+    def refreshPlaylist(self, name):
+        '''
+        Re-scans a single playlist after it has changed on disk. New playlists
+            are added, emptied or deleted playlists are removed and existing
+            playlists have their tracks replaced. The track that is currently
+            selected in a playlist stays selected, if it still exists.
+        :param: name Name of the playlist entry in the music directory
+        :return: Playlist id affected or None if nothing changed
+        '''
+        name, source, deps, tracks, isFresh = self.scanner.scanPlaylist(name,
+            force=True)
+        if ((isFresh) and (self.index != None)):
+            self.index.update(name, deps, tracks)
+            self.index.save()
+        if ((tracks == None) or (len(tracks) < 1)):
+            return self.removePlaylist(name)
+        self.deps[name] = list(deps.keys())
+        pl_id = self.ids.get(name)
+        # brand new playlist
+        if (pl_id == None):
+            pl_id = self.next_id
+            self.next_id += 1
+            self.mkPlaylist(pl_id, name, source, tracks)
+            return pl_id
+        playlist = self.playlists[pl_id]
+        self.bases[pl_id] = source.baseDir(self.path, name)
+        if (playlist.name != source.title(name)):
+            playlist.name = source.title(name)
+            # the announcement has to be regenerated for the new name
+            playlist.ttsFile = None
+        if not(playlist.isLoaded):
+            self.pending[pl_id] = tracks
+            self.mkArtist(playlist)
+            return pl_id
+        cur_name = playlist.currentTrack().name
+        self.dropStreams(playlist)
+        playlist.setTracks(self.mkTracks(pl_id, tracks))
+        playlist.cur = 0
+        for idx, track in enumerate(playlist.tracks):
+            if (track.name == cur_name):
+                playlist.setCurrent(idx)
+                break
+        self.mkArtist(playlist)
+        return pl_id
+
+    def removePlaylist(self, name):
+        '''
+        Removes a playlist that no longer exists on disk
+        :param: name Name of the playlist entry in the music directory
+        :return: Playlist id removed or None if it was not known
+        '''
+        self.deps.pop(name, None)
+        pl_id = self.ids.pop(name, None)
+        if (pl_id == None):
+            return None
+        self.dropStreams(self.playlists.pop(pl_id))
+        del self.bases[pl_id]
+        self.artists.pop(pl_id, None)
+        if (self.index != None):
+            self.index.prune(self.ids.keys())
+            self.index.save()
+        return pl_id
+
+    def renamePlaylist(self, old, new):
+        '''
+        Renames a playlist, keeping its id and play position
+        :param: old Previous name of the playlist entry
+        :param: new New name of the playlist entry
+        :return: Playlist id affected or None if nothing changed
+        '''
+        self.deps.pop(old, None)
+        pl_id = self.ids.pop(old, None)
+        if (pl_id != None):
+            self.ids[new] = pl_id
+        # stream locations contain the entry name
+        return self.refreshPlaylist(new)
 
     def getPlaylists(self):
         '''
@@ -74,12 +330,51 @@ class LocalService(MusicService):
         '''
         return self.playlists
 
-    def getStream(self, playlist):
+    def getOrder(self):
+        '''
+        Returns the order in which playlists are presented to the user;
+            sorted by name, including playlists added while running
+        :return: List of playlist ids
+        '''
+        return [pl_id for name, pl_id in sorted(self.ids.items())]
+
+    def getTextTTS(self, playlist):
+        '''
+        Builds the text read out when switching to a playlist. If every track
+            with a known artist shares the same one, the artist is read out too.
+        :param: playlist Reference to Playlist object
+        :return: Text to synthesize
+        '''
+        text = MusicService.getTextTTS(self, playlist)
+        artist = self.artists.get(playlist.id)
+        if (artist != None):
+            text = text[:-1] + ", by " + artist + "."
+        return text
+
+    def prefetch(self, playlist):
+        '''
+        Reads the start of the next few songs of a playlist (in play order)
+            into memory in the background
+        :param: playlist Reference to Playlist object
+        '''
+        playlist.load()
+        paths = []
+        for offset in range(1, min(PREFETCH_TRACKS, len(playlist.tracks) - 1)
+                + 1):
+            paths.append(self.trackPath(playlist.id,
+                playlist.peek(offset).name))
+        self.prefetcher.request(paths)
+
+    def getStream(self, playlist, offset=0):
         '''
         Retrieves the location of the (current) song to play
         :param: playlist Reference to Playlist object to use
+        :param: offset Number of songs past the current one (to look ahead
+            without moving)
         :return: Music stream location
         '''
+        if (offset != 0):
+            return self.streams[playlist.id,playlist.peek(offset).id]
         return self.streams[playlist.id,playlist.current()]
 
 def main():
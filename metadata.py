@@ -0,0 +1,477 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import os
+import struct
+import threading
+import multiprocessing
+# Local imports
+from jsonstore import nativeStr, fileStr, loadJSON, saveJSON
+
+'''
+metadata.py
+Python module that reads tag and duration information out of local music
+    files (ID3, Vorbis comments and RIFF INFO chunks) and caches the results
+    on disk, so that files are only ever parsed again if they change
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Layout version of the cache file (see jsonstore.py)
+CACHE_VERSION = 2
+# Most tags live at the start of a file; never read more than this to find them
+HEAD_SIZE = 256 * 1024
+# Amount of the end of a file to read (ID3v1 tags, last Ogg page)
+TAIL_SIZE = 64 * 1024
+# Number of files to parse concurrently
+try:
+    DEFAULT_WORKERS = multiprocessing.cpu_count()
+except NotImplementedError:
+    DEFAULT_WORKERS = 2
+
+# ID3v2 frame ids (v2.3/v2.4 and v2.2) -> metadata keys
+ID3_FRAMES = {
+    'TIT2' : 'title',   'TT2' : 'title',
+    'TPE1' : 'artist',  'TP1' : 'artist',
+    'TALB' : 'album',   'TAL' : 'album',
+    'TLEN' : 'length',  'TLE' : 'length',
+}
+# Vorbis comment fields -> metadata keys
+VORBIS_FIELDS = {
+    'TITLE' : 'title',
+    'ARTIST': 'artist',
+    'ALBUM' : 'album',
+}
+# RIFF INFO sub-chunks -> metadata keys
+RIFF_FIELDS = {
+    'INAM' : 'title',
+    'IART' : 'artist',
+    'IPRD' : 'album',
+}
+# MPEG audio bitrates (kbps), indexed by [MPEG1?][layer][bitrate index]
+MPEG_BITRATES = {
+    True : {
+        1 : [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384,
+            416, 448],
+        2 : [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320,
+            384],
+        3 : [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256,
+            320],
+    },
+    False : {
+        1 : [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224,
+            256],
+        2 : [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        3 : [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+# MPEG audio sample rates, indexed by version bits then sample rate index
+MPEG_RATES = {
+    3 : [44100, 48000, 32000],  # MPEG 1
+    2 : [22050, 24000, 16000],  # MPEG 2
+    0 : [11025, 12000, 8000],   # MPEG 2.5
+}
+
+def decodeText(data, encoding):
+    '''
+    Decodes an ID3 text frame's contents
+    :param: data Raw frame contents (after the encoding byte)
+    :param: encoding ID3 text encoding byte
+    :return: Native string
+    '''
+    if (encoding == 1):
+        text = data.decode("utf-16", "replace")
+    elif (encoding == 2):
+        text = data.decode("utf-16-be", "replace")
+    elif (encoding == 3):
+        text = data.decode("utf-8", "replace")
+    else:
+        text = data.decode("latin-1")
+    return nativeStr(text.split(u"\x00")[0].strip())
+
+def syncsafe(data):
+    '''
+    Decodes a 4 byte ID3 "syncsafe" integer (7 bits per byte)
+    :param: data 4 bytes
+    :return: Integer value
+    '''
+    b = bytearray(data)
+    return (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+
+def parseID3(head, meta):
+    '''
+    Parses an ID3v2 tag at the start of a file
+    :param: head First bytes of the file
+    :param: meta Dictionary to store results in
+    :return: Size of the tag in bytes (0 if there is no tag)
+    '''
+    if ((len(head) < 10) or (head[0:3] != b"ID3")):
+        return 0
+    ver = bytearray(head[3:4])[0]
+    size = syncsafe(head[6:10]) + 10
+    pos = 10
+    hdrLen = 6 if (ver == 2) else 10
+    end = min(size, len(head))
+    while (pos + hdrLen <= end):
+        if (ver == 2):
+            frame = head[pos:pos + 3].decode("latin-1")
+            b = bytearray(head[pos + 3:pos + 6])
+            frameLen = (b[0] << 16) | (b[1] << 8) | b[2]
+        else:
+            frame = head[pos:pos + 4].decode("latin-1")
+            if (ver >= 4):
+                frameLen = syncsafe(head[pos + 4:pos + 8])
+            else:
+                frameLen = struct.unpack(">I", head[pos + 4:pos + 8])[0]
+        # padding marks the end of the frames
+        if ((frameLen == 0) or (frame[0] == u"\x00")):
+            break
+        body = head[pos + hdrLen:pos + hdrLen + frameLen]
+        key = ID3_FRAMES.get(frame)
+        if ((key != None) and (len(body) > 1)):
+            value = decodeText(body[1:], bytearray(body[0:1])[0])
+            if (key == 'length'):
+                try:
+                    meta['duration'] = int(value) / 1000.0
+                except ValueError:
+                    pass
+            elif (len(value) > 0):
+                meta[key] = value
+        pos += hdrLen + frameLen
+    return size
+
+def parseID3v1(tail, meta):
+    '''
+    Parses an ID3v1 tag (last 128 bytes of a file), filling in anything the
+        ID3v2 tag did not provide
+    :param: tail Last bytes of the file
+    :param: meta Dictionary to store results in
+    '''
+    tag = tail[-128:]
+    if ((len(tag) < 128) or (tag[0:3] != b"TAG")):
+        return
+    for key, start in (('title', 3), ('artist', 33), ('album', 63)):
+        value = decodeText(tag[start:start + 30], 0)
+        if ((len(value) > 0) and not(key in meta)):
+            meta[key] = value
+
+def parseMP3(fd, size, meta):
+    '''
+    Reads the tags and estimates the duration of an MP3 file
+    :param: fd Open file
+    :param: size File size in bytes
+    :param: meta Dictionary to store results in
+    '''
+    # the tag header says how much of the file the tag takes up; only that
+    # much is read
+    head = fd.read(10)
+    if ((len(head) == 10) and (head[0:3] == b"ID3")):
+        head += fd.read(min(syncsafe(head[6:10]), HEAD_SIZE - 10))
+    tagSize = parseID3(head, meta)
+    fd.seek(max(0, size - 128))
+    parseID3v1(fd.read(128), meta)
+    if ('duration' in meta):
+        return
+    # find the first MPEG audio frame after the tag
+    fd.seek(tagSize)
+    data = bytearray(fd.read(8192))
+    for pos in range(len(data) - 4):
+        if ((data[pos] != 0xFF) or ((data[pos + 1] & 0xE0) != 0xE0)):
+            continue
+        version = (data[pos + 1] >> 3) & 0x03
+        layer = 4 - ((data[pos + 1] >> 1) & 0x03)
+        rateIdx = (data[pos + 2] >> 2) & 0x03
+        bitIdx = (data[pos + 2] >> 4) & 0x0F
+        if ((version == 1) or (layer == 4) or (rateIdx == 3) or
+                (bitIdx == 0) or (bitIdx == 15)):
+            continue
+        isMPEG1 = (version == 3)
+        rate = MPEG_RATES[version][rateIdx]
+        bitrate = MPEG_BITRATES[isMPEG1][layer][bitIdx] * 1000
+        mono = (((data[pos + 3] >> 6) & 0x03) == 3)
+        if (layer == 1):
+            spf = 384
+        elif ((layer == 3) and not(isMPEG1)):
+            spf = 576
+        else:
+            spf = 1152
+        # VBR files carry a frame count in a Xing/Info header
+        if (isMPEG1):
+            xing = pos + (21 if (mono) else 36)
+        else:
+            xing = pos + (13 if (mono) else 21)
+        marker = bytes(data[xing:xing + 4])
+        if ((marker in (b"Xing", b"Info")) and (data[xing + 7] & 0x01)):
+            frames = struct.unpack(">I", bytes(data[xing + 8:xing + 12]))[0]
+            meta['duration'] = frames * spf / float(rate)
+        else:
+            meta['duration'] = (size - tagSize - pos) * 8 / float(bitrate)
+        return
+
+def oggPackets(data):
+    '''
+    Splits the start of an Ogg stream into packets
+    :param: data First bytes of the file
+    :return: List of packets (the last one may be truncated)
+    '''
+    packets = []
+    cur = b""
+    pos = 0
+    while ((pos + 27 <= len(data)) and (data[pos:pos + 4] == b"OggS")):
+        nsegs = bytearray(data[pos + 26:pos + 27])[0]
+        segs = bytearray(data[pos + 27:pos + 27 + nsegs])
+        pos += 27 + nsegs
+        for seg in segs:
+            cur += data[pos:pos + seg]
+            pos += seg
+            if (seg < 255):
+                packets.append(cur)
+                cur = b""
+        # stop after the identification and comment headers
+        if (len(packets) >= 2):
+            break
+    if (len(cur) > 0):
+        packets.append(cur)
+    return packets
+
+def parseOgg(fd, size, meta):
+    '''
+    Reads the Vorbis comments and duration of an Ogg Vorbis file
+    :param: fd Open file
+    :param: size File size in bytes
+    :param: meta Dictionary to store results in
+    '''
+    packets = oggPackets(fd.read(HEAD_SIZE))
+    if ((len(packets) < 1) or (packets[0][1:7] != b"vorbis")):
+        return
+    rate = struct.unpack("<I", packets[0][12:16])[0]
+    if ((len(packets) > 1) and (packets[1][0:7] == b"\x03vorbis")):
+        comment = packets[1]
+        try:
+            pos = 7
+            vendorLen = struct.unpack("<I", comment[pos:pos + 4])[0]
+            pos += 4 + vendorLen
+            count = struct.unpack("<I", comment[pos:pos + 4])[0]
+            pos += 4
+            for i in range(count):
+                fieldLen = struct.unpack("<I", comment[pos:pos + 4])[0]
+                pos += 4
+                field = comment[pos:pos + fieldLen].decode("utf-8", "replace")
+                pos += fieldLen
+                key, sep, value = field.partition(u"=")
+                key = VORBIS_FIELDS.get(key.upper())
+                if ((key != None) and not(key in meta)):
+                    meta[key] = nativeStr(value.strip())
+        except struct.error:
+            # comment header was cut short; keep what was read
+            pass
+    # the granule position of the last page is the total number of samples
+    fd.seek(max(0, size - TAIL_SIZE))
+    tail = fd.read(TAIL_SIZE)
+    last = tail.rfind(b"OggS")
+    if ((last >= 0) and (last + 14 <= len(tail)) and (rate > 0)):
+        granule = struct.unpack("<q", tail[last + 6:last + 14])[0]
+        if (granule > 0):
+            meta['duration'] = granule / float(rate)
+
+def parseWav(fd, size, meta):
+    '''
+    Reads the RIFF INFO tags and duration of a WAV file
+    :param: fd Open file
+    :param: size File size in bytes
+    :param: meta Dictionary to store results in
+    '''
+    head = fd.read(12)
+    if ((len(head) < 12) or (head[0:4] != b"RIFF") or
+            (head[8:12] != b"WAVE")):
+        return
+    byteRate = 0
+    pos = 12
+    while (pos + 8 <= size):
+        fd.seek(pos)
+        chunk = fd.read(8)
+        if (len(chunk) < 8):
+            break
+        chunkId = chunk[0:4]
+        chunkLen = struct.unpack("<I", chunk[4:8])[0]
+        if (chunkId == b"fmt "):
+            byteRate = struct.unpack("<I", fd.read(12)[8:12])[0]
+        elif ((chunkId == b"data") and (byteRate > 0)):
+            meta['duration'] = min(chunkLen, size - pos - 8) / float(byteRate)
+        elif (chunkId == b"LIST"):
+            body = fd.read(min(chunkLen, HEAD_SIZE))
+            if (body[0:4] == b"INFO"):
+                sub = 4
+                while (sub + 8 <= len(body)):
+                    subId = body[sub:sub + 4].decode("latin-1")
+                    subLen = struct.unpack("<I", body[sub + 4:sub + 8])[0]
+                    key = RIFF_FIELDS.get(subId)
+                    if (key != None):
+                        value = decodeText(body[sub + 8:sub + 8 + subLen], 0)
+                        if (len(value) > 0):
+                            meta[key] = value
+                    # sub-chunks are padded to an even length
+                    sub += 8 + subLen + (subLen & 1)
+        # chunks are padded to an even length
+        pos += 8 + chunkLen + (chunkLen & 1)
+
+# File extension -> parser
+PARSERS = {
+    '.mp3' : parseMP3,
+    '.ogg' : parseOgg,
+    '.wav' : parseWav,
+}
+
+def readMetadata(path):
+    '''
+    Reads the metadata of a single music file. This is a plain module-level
+        function so that it can be handed to a process pool.
+    :param: path Path to the music file
+    :return: Dictionary with any of the keys title, artist, album, duration
+    '''
+    meta = {}
+    parser = PARSERS.get(os.path.splitext(path)[1].lower())
+    if (parser == None):
+        return meta
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as fd:
+            parser(fd, size, meta)
+    except (IOError, OSError, struct.error, IndexError, KeyError):
+        pass
+    return meta
+
+class MetadataCache:
+    '''
+    Class that stores the metadata of music files on disk. Entries are keyed
+        by path and are only trusted while the file's size and modification
+        time are unchanged.
+    '''
+    def __init__(self, fileName, workers=DEFAULT_WORKERS):
+        '''
+        Constructor
+        :param: fileName Path to the cache file
+        :param: workers Number of processes used to parse files
+        '''
+        self.fileName = fileName
+        self.workers = workers
+        # [path] -> [size, mtime, metadata dictionary]
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def load(self):
+        '''
+        Reads the cache in from disk. A missing or corrupt cache is treated
+            as an empty one.
+        :return: True if a cache was loaded, False otherwise
+        '''
+        data = loadJSON(self.fileName, CACHE_VERSION)
+        if (data == None):
+            return False
+        entries = {}
+        for path, entry in data.get("entries", {}).items():
+            meta = {}
+            for key, value in entry[2].items():
+                if (isinstance(value, float) or isinstance(value, int)):
+                    meta[fileStr(key)] = value
+                else:
+                    meta[fileStr(key)] = fileStr(value)
+            entries[fileStr(path)] = [entry[0], entry[1], meta]
+        with self.lock:
+            self.entries = entries
+        return True
+
+    def save(self):
+        '''
+        Writes the cache out to disk
+        '''
+        with self.lock:
+            data = {
+                "entries"   : dict(self.entries),
+            }
+        saveJSON(self.fileName, CACHE_VERSION, data, "metadata cache")
+
+    def lookup(self, path):
+        '''
+        Looks up the cached metadata of a file. This never touches the disk;
+            entries are validated by refresh().
+        :param: path Path to the music file
+        :return: Metadata dictionary or None if the file is not cached
+        '''
+        entry = self.entries.get(path)
+        if (entry == None):
+            return None
+        return entry[2]
+
+    def refresh(self, paths):
+        '''
+        Brings the cache up to date for a set of files. Only files that are
+            new or whose size/modification time changed are parsed, in a pool
+            of processes. Files no longer in the set are dropped.
+        :param: paths List of paths to music files
+        :return: List of paths that were (re-)parsed
+        '''
+        stale = []
+        stats = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stats[path] = (st.st_size, st.st_mtime)
+            entry = self.entries.get(path)
+            if ((entry == None) or (entry[0] != st.st_size) or
+                    (entry[1] != st.st_mtime)):
+                stale.append(path)
+        if ((self.workers > 1) and (len(stale) > 1)):
+            pool = multiprocessing.Pool(min(self.workers, len(stale)))
+            try:
+                results = pool.map(readMetadata, stale)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [readMetadata(path) for path in stale]
+        with self.lock:
+            entries = {}
+            for path, st in stats.items():
+                if (path in self.entries):
+                    entries[path] = self.entries[path]
+            for path, meta in zip(stale, results):
+                entries[path] = [stats[path][0], stats[path][1], meta]
+            changed = ((len(stale) > 0) or
+                (len(entries) != len(self.entries)))
+            self.entries = entries
+        if (changed):
+            self.save()
+        return stale
+
+    def refreshAsync(self, getPaths, onDone=None):
+        '''
+        Loads the cache and runs refresh() in a background thread, so that
+            neither holds up start-up
+        :param: getPaths Function that lists the paths to music files (called
+            from the background thread)
+        :param: onDone (Optional) Function to call with the list of (re-)parsed
+            paths once the refresh has finished
+        '''
+        def run():
+            self.load()
+            stale = self.refresh(getPaths())
+            if (onDone != None):
+                onDone(stale)
+        self.thread = threading.Thread(target=run)
+        self.thread.daemon = True
+        self.thread.start()
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+    import sys
+    for path in sys.argv[1:]:
+        print(path + ": " + str(readMetadata(path)))
+
+if __name__ == '__main__':
+    main()
@@ -40,10 +40,35 @@ class MusicService:
         raise Exception("getPlaylists() not implemented for service " 
             + self.strType)
 
-    def getStream(self, playlist):
+    def getOrder(self):
+        '''
+        Returns the order in which playlists are presented to the user
+        :return: List of playlist ids
+        '''
+        return sorted(self.getPlaylists().keys())
+
+    def getTextTTS(self, playlist):
+        '''
+        Builds the text read out when switching to a playlist
+        :param: playlist Reference to Playlist object
+        :return: Text to synthesize
+        '''
+        return "Playing " + self.plTypeTTS + " " + playlist.name + "."
+
+    def prefetch(self, playlist):
+        '''
+        Gets the songs coming up in a playlist ready to play. Services that
+            can't do anything useful ahead of time leave this alone.
+        :param: playlist Reference to Playlist object
+        '''
+        pass
+
+    def getStream(self, playlist, offset=0):
         '''
         Retrieves the location of the (current) song to play
         :param: playlist Reference to Playlist object to use
+        :param: offset Number of songs past the current one (to look ahead
+            without moving)
         :return: Music stream location
         '''
         # "Enforce" interface
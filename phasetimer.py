@@ -0,0 +1,98 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import json
+import time
+from contextlib import contextmanager
+from timeit import default_timer
+
+'''
+phasetimer.py
+Python class that times the named phases of a multi-step process (such as
+    starting up the remote) and reports where the time went
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+class PhaseTimer:
+    '''
+    Class that records how long each phase of a process takes
+    '''
+    def __init__(self, name):
+        '''
+        Constructor
+        :param: name Name of the process being timed
+        '''
+        self.name = name
+        # wall-clock time the process started (for the record)
+        self.timestamp = time.time()
+        self.start = default_timer()
+        # list of [phase name, seconds since start, duration in seconds]
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        '''
+        Times a phase; use as "with timer.phase(name):". The phase is recorded
+            even if it raises.
+        :param: name Name of the phase
+        '''
+        begin = default_timer()
+        try:
+            yield
+        finally:
+            end = default_timer()
+            self.phases.append([name, begin - self.start, end - begin])
+
+    def total(self):
+        '''
+        Time elapsed since the timer was created
+        :return: Seconds
+        '''
+        return default_timer() - self.start
+
+    def record(self):
+        '''
+        Builds a structured record of the phases timed so far
+        :return: Dictionary that can be serialized to JSON
+        '''
+        return {
+            "name"      : self.name,
+            "timestamp" : self.timestamp,
+            "total"     : self.total(),
+            "phases"    : [{ "name" : name, "start" : start,
+                "duration" : duration } for name, start, duration
+                in self.phases],
+        }
+
+    def __str__(self):
+        '''
+        __str__
+        :return: One line summary of the phases and their durations
+        '''
+        phaseStr = ", ".join("%s %.3fs" % (name, duration)
+            for name, start, duration in self.phases)
+        return "%s: %.3fs [ %s ]" % (self.name, self.total(), phaseStr)
+
+    def log(self, fileName=None):
+        '''
+        Prints a summary and, if a file is provided, appends the record to it
+            as one line of JSON
+        :param: fileName (Optional) Path to the log file
+        '''
+        print(str(self))
+        if (fileName == None):
+            return
+        try:
+            with open(fileName, "a") as fd:
+                fd.write(json.dumps(self.record(), sort_keys=True) + "\n")
+        except (IOError, OSError):
+            print("Warning: Unable to write timing log " + fileName)
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
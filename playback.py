@@ -2,11 +2,15 @@
 from __future__ import print_function
 import os
 from os.path import *
+import shutil
 import subprocess
 import pygst
 import gst
 # Local imports
+from jsonstore import fileStr
 from musicservice import ServiceException
+from ttscache import TTSCache
+from speech import SpeechPlayer, normalizeWav, SPEECH_RMS, SPEECH_PEAK
 
 '''
 playback.py
@@ -18,8 +22,20 @@ __author__ = "Schuyler Martin"
 
 # constant volume values for audio player
 VOLUME_DEFAULT = 1.0
-# the speech files are way quieter than the rest of the music
-VOLUME_SPEECH = 7.0
+# music volume while an announcement plays over it, and while one plays with
+# the music held (see announce())
+VOLUME_DUCKED = 0.3
+VOLUME_MUTED = 0.0
+# Longest time (in seconds) to hold up a playlist switch waiting for its
+# announcement to be generated; past this, the music plays unannounced
+TTS_WAIT = 0.5
+# Longest time (in nanoseconds) to wait for a song to load before seeking in it
+SEEK_TIMEOUT = 2 * gst.SECOND
+# see espeak man page for more info for args. These are part of the key of
+# every cached text-to-speech file, so changing them regenerates the cache.
+ESPEAK_ARGS = ["-s 120", "-a 20"]
+# sub-directory of the cache path that holds the text-to-speech files
+TTS_DIR = "tts/"
 
 def mkTextSpeech(text, fileName):
     '''
@@ -27,42 +43,66 @@ def mkTextSpeech(text, fileName):
     :param: text Text to synthesize
     :param: fileName File name to write-out to
     '''
-    # see espeak man page for more info for args
-    subprocess.call(["espeak",
-        "-s 120",
-        "-a 20",
-        "-w" + fileName, text])
+    subprocess.call(["espeak"] + ESPEAK_ARGS + ["-w" + fileName, text])
+
+def mkSpeechClip(text, fileName):
+    '''
+    Writes a loudness-normalized text-to-speech file
+    :param: text Text to synthesize
+    :param: fileName File name to write-out to
+    '''
+    mkTextSpeech(text, fileName)
+    normalizeWav(fileName)
 
 class Playback:
     '''
     Class that represents the playback system
     '''
     @staticmethod
-    def constructPlayer():
+    def constructPlayer(speaker):
         '''
         Builds a single instance of the media player; to be shared by all
             playback instances
+        :param: speaker SpeechPlayer that mixes announcements in with the
+            music
         :return: GST Player object
         '''
         # music player object for the stream
         player = gst.element_factory_make("playbin2", "player")
 
         # disable any attempts at playing video content
-        # Flags: video | audio | subtitles | software volume
-        player.set_property("flags", 2)
-
-        # set playback device to bluetooth
-        alsa_card = gst.element_factory_make("alsasink", "bluetooth")
-        # Notes to self about bluetooth:
-        # - config for alsa is set is /etc/asound.conf
-        # - confic for bluetooth audio is /etc/bluetooth/audio.conf
-        # - bluetooth daemon: /etc/init.d/bluetooth 
-        # - also make sure that there are no other connections to the speaker
-        alsa_card.set_property("device", "bluetooth")
-        player.set_property("audio-sink", alsa_card)
+        # Flags: video (1) | audio (2) | subtitles (4) | software volume (16)
+        # The volume is applied to the music before the announcements are
+        # mixed in, so ducking the music leaves them alone.
+        player.set_property("flags", 2 | 16)
+
+        # music and announcements are mixed into the bluetooth device (see
+        # speech.AUDIO_DEVICE)
+        player.set_property("audio-sink", speaker.mkSink())
         return player
+
+    @staticmethod
+    def constructTTS(cachePath):
+        '''
+        Builds a single text-to-speech cache; to be shared by all playback
+            instances
+        :param: cachePath Path to caching information
+        :return: TTSCache object
+        '''
+        params = " ".join(["espeak"] + ESPEAK_ARGS
+            + ["rms=" + str(SPEECH_RMS), "peak=" + str(SPEECH_PEAK)])
+        return TTSCache(cachePath + TTS_DIR, mkSpeechClip, params)
+
+    @staticmethod
+    def constructSpeaker():
+        '''
+        Builds a single instance of the announcement player; to be shared by
+            all playback instances
+        :return: SpeechPlayer object
+        '''
+        return SpeechPlayer()
         
-    def __init__(self, player, service, cachePath):
+    def __init__(self, player, service, cachePath, tts=None, speaker=None):
         '''
         Constructor
         :param: player Reference to the music playback device
@@ -70,77 +110,372 @@ class Playback:
             service-specific concerns. A service may be a streaming system
             usic service/playback object type
         :param: cachePath Path to caching information
+        :param: tts (Optional) TTSCache that generates text-to-speech files
+            in the background; may be shared by playback instances
+        :param: speaker (Optional) SpeechPlayer that mixes announcements in
+            with the music; may be shared by playback instances. It has to be
+            the one the player was built with; without one, a new one is
+            hooked up to the player.
         '''
         self.service = service
         self.cachePath = cachePath
-        # tracks if we are playing the TTS playlist file now
+        if (tts == None):
+            tts = Playback.constructTTS(cachePath)
+        self.tts = tts
+        if (speaker == None):
+            speaker = Playback.constructSpeaker()
+            player.set_property("audio-sink", speaker.mkSink())
+        self.speaker = speaker
+        # tracks if the next play() should announce the playlist first
         self.pl_TTS = False
-        # tracks if we are playing the TTS shuffle commands now
-        self.shuffle_TTS = False
+        # player state last requested, and last reported on the player's bus
+        # (see stateChanged()). Kept here so that nothing has to block on
+        # the player to find out what it is doing.
+        self.target = gst.STATE_NULL
+        self.state = gst.STATE_NULL
+        # if a requested change hasn't been reported on the bus yet
+        self.changing = False
+        # (playlist, track index) of the song queued up to play next by
+        # queueNext(); cleared when anything else is put on the player
+        self.queued = None
         # dictionary of playlists; playlist id from service is the key
         self.playlists = self.service.getPlaylists()
         # initialize/use cache info
         self.init_cache()
         # if no playlists available, we have a problem to report up
-        if (len(self.playlists.keys()) < 1):
+        if (len(self.playlists) < 1):
             raise ServiceException("No Playlists Found")
-        # ptr to current playlist (pick the first one by default)
+        # playlist ids in the order the service wants them presented
+        self.order = []
+        # [playlist id] -> position in the ordering
+        self.positions = {}
+        self.mkOrder()
+        # ptr to current playlist (pick the first one by default). cur_id is
+        # the position of the current playlist in the ordering
         self.cur_id = 0
-        self.cur = self.playlists[self.playlists.keys()[self.cur_id]]
+        self.cur = self.playlists[self.order[self.cur_id]]
         self.player = player
 
+    def mkOrder(self):
+        '''
+        (Re-)builds the ordered index of playlists
+        '''
+        self.order = self.service.getOrder()
+        self.positions = {}
+        for pos, pl_id in enumerate(self.order):
+            self.positions[pl_id] = pos
+
     def init_cache(self):
         '''
         Initialize and use cache info. There is a cache for each service
             that provides the following:
             - Tracks/builds playlist text-to-speech information
+            Missing text-to-speech files are generated in the background.
         '''
-        # in the cache path, check to see if the shuffle sounds are there
-        self.shuffle_Files = {}
-        self.shuffle_Files[True] = self.cachePath + "shuffleOn.wav"
-        self.shuffle_Files[False] = self.cachePath + "shuffleOff.wav"
-        if not(os.path.exists(self.shuffle_Files[True])):
-            mkTextSpeech("Setting shuffle on ", self.shuffle_Files[True])
-        if not(os.path.exists(self.shuffle_Files[False])):
-            mkTextSpeech("Setting shuffle off", self.shuffle_Files[False])
-        # for each service
+        # clean out the files of the old, per-playlist cache layout
+        for isShuffle in (True, False):
+            oldFile = self.cachePath + ("shuffleOff.wav", "shuffleOn.wav")[
+                isShuffle]
+            if (os.path.exists(oldFile)):
+                os.remove(oldFile)
         srvPath = self.cachePath + self.service.strType + "/"
-        if not(os.path.exists(srvPath)):
-            os.makedirs(srvPath)
+        if (os.path.isdir(srvPath)):
+            shutil.rmtree(srvPath, ignore_errors=True)
+        # check to see if the shuffle sounds are there
+        self.shuffle_Files = {}
+        self.shuffle_Files[True] = self.tts.request("Setting shuffle on ")
+        self.shuffle_Files[False] = self.tts.request("Setting shuffle off")
         # generate any missing playlist text-to-speech data
         for ids, pl in self.playlists.iteritems():
-            speakFile = srvPath + pl.name + ".wav"
-            if not(os.path.exists(speakFile)):
-                # write file to cache
-                mkTextSpeech("Playing " + self.service.plTypeTTS +" " 
-                    + pl.name + ".", speakFile)
-            pl.ttsFile = "file://" + speakFile
+            self.mkPlaylistTTS(pl)
+
+    def mkPlaylistTTS(self, pl):
+        '''
+        Sets the text-to-speech file of a playlist, generating it if missing
+        :param: pl Playlist to read out
+        :return: Location of the text-to-speech file
+        '''
+        # write file to cache (if missing)
+        speakFile = self.tts.request(self.service.getTextTTS(pl))
+        pl.ttsFile = "file://" + speakFile
+        return pl.ttsFile
+
+    def ttsReady(self, uri):
+        '''
+        Checks that a text-to-speech file can be played, giving it priority
+            (and a short while to finish) if it is still being generated
+        :param: uri Location of the text-to-speech file
+        :return: True if the file is ready to play
+        '''
+        return self.tts.wait(uri[len("file://"):], TTS_WAIT)
+
+    def reindex(self):
+        '''
+        Picks up playlists that were added, removed or renamed by the service
+            while running. The current stream is left alone; if the current
+            playlist was removed, the next song comes from its neighbor.
+        '''
+        if (len(self.playlists) < 1):
+            return
+        for ids, pl in self.playlists.iteritems():
+            if (pl.ttsFile == None):
+                self.mkPlaylistTTS(pl)
+        self.mkOrder()
+        if (self.cur.id in self.positions):
+            self.cur_id = self.positions[self.cur.id]
+        else:
+            self.cur_id = min(self.cur_id, len(self.order) - 1)
+            self.cur = self.playlists[self.order[self.cur_id]]
+
+    def setPlayer(self, player):
+        '''
+        Switches to a new (rebuilt) player
+        :param: player Reference to the music playback device
+        '''
+        self.player = player
+        self.target = gst.STATE_NULL
+        self.state = gst.STATE_NULL
+        self.changing = False
+        self.queued = None
+
+    def setState(self, state):
+        '''
+        Changes the state of the player (which may complete asynchronously)
+        :param: state GST state to change to
+        '''
+        if ((state == gst.STATE_READY) or (state == gst.STATE_NULL)):
+            # the clip's data (and end) would be flushed, leaving the mixer
+            # waiting on it
+            self.speaker.stop()
+        self.target = state
+        ret = self.player.set_state(state)
+        if (ret == gst.STATE_CHANGE_FAILURE):
+            self.target = self.state
+            self.changing = False
+        else:
+            # a change to the state the player is already in completes
+            # without a message on the bus
+            self.changing = not((ret == gst.STATE_CHANGE_SUCCESS)
+                and (state == self.state))
+
+    def error(self):
+        '''
+        Handles an error from the player's bus. Whatever change was in flight
+            won't complete, so the player stays in the state it last reported.
+        '''
+        self.target = self.state
+        self.changing = False
+
+    def stateChanged(self, message):
+        '''
+        Handles a state change message from the player's bus
+        :param: message Message object from bus
+        '''
+        old, new, pending = message.parse_state_changed()
+        self.state = new
+        if (pending == gst.STATE_VOID_PENDING):
+            if (new == self.target):
+                self.changing = False
+            elif not(self.changing):
+                # the player changed state by itself
+                self.target = new
+
+    def announce(self, uri, resume=True):
+        '''
+        Mixes a text-to-speech clip (from memory) in with the music
+        :param: uri Location of the text-to-speech file
+        :param: resume If True, the music plays (ducked) under the clip.
+            Otherwise the music is held: the player has to run for the clip
+            to be heard, so the music runs muted under it and is put back
+            the way it was once the clip has finished.
+        :return: True if the clip is playing, False if it isn't available
+        '''
+        if not(self.ttsReady(uri)):
+            return False
+        clip = self.tts.clip(uri[len("file://"):])
+        if (clip == None):
+            return False
+        if (resume):
+            self.player.set_property("volume", VOLUME_DUCKED)
+            self.setState(gst.STATE_PLAYING)
+            self.speaker.say(clip, self.resume)
+            return True
+        state = self.target
+        position = self.position()
+        self.player.set_property("volume", VOLUME_MUTED)
+        self.setState(gst.STATE_PLAYING)
+        self.speaker.say(clip, lambda: self.hold(state, position))
+        return True
+
+    def resume(self):
+        '''
+        Brings the music back (to full volume) after an announcement
+        '''
+        self.player.set_property("volume", VOLUME_DEFAULT)
+
+    def hold(self, state, position):
+        '''
+        Puts the music back the way it was before an announcement was played
+            over it (muted)
+        :param: state GST state the player was in
+        :param: position Position in the song (in nanoseconds) or None
+        '''
+        self.setState(state)
+        if ((state == gst.STATE_PAUSED) and (position != None)):
+            self.player.seek_simple(gst.FORMAT_TIME,
+                gst.SEEK_FLAG_FLUSH | gst.SEEK_FLAG_KEY_UNIT, position)
+        self.player.set_property("volume", VOLUME_DEFAULT)
 
     def play(self):
         '''
         Play the current song and return the stream location
         :return: Stream uri
         '''
-        pl = self.playlists[self.playlists.keys()[self.cur_id]]
-        # special case for playing the text-to-speech message
-        if ((self.pl_TTS) and (pl.ttsFile != None)):
-            self.player.set_property("volume", VOLUME_SPEECH)
-            mp3Stream = pl.ttsFile
-        else:
-            self.player.set_property("volume", VOLUME_DEFAULT)
-            # get location of the stream from the current playlist
-            mp3Stream = self.service.getStream(self.cur)
-        # set the stream location and begin playing music
+        pl = self.cur
+        # whatever was being announced is over
+        self.speaker.stop()
+        self.player.set_property("volume", VOLUME_DEFAULT)
+        # get location of the stream from the current playlist
+        mp3Stream = self.service.getStream(self.cur)
+        self.player.set_property("uri", mp3Stream)
+        self.queued = None
+        self.service.prefetch(self.cur)
+        # special case for playing the text-to-speech message; the music
+        # starts (ducked) underneath it. Announcements that aren't available
+        # (yet) are skipped.
+        announce = self.pl_TTS
+        self.pl_TTS = False
+        if (announce):
+            # the service drops announcements that have changed (such as once
+            # a playlist's artist is known, from a background thread)
+            ttsFile = pl.ttsFile
+            if (ttsFile == None):
+                ttsFile = self.mkPlaylistTTS(pl)
+            if (self.announce(ttsFile)):
+                return mp3Stream
+        # begin playing music
+        self.setState(gst.STATE_PLAYING)
+        return mp3Stream
+
+    def playFrom(self, position):
+        '''
+        Play the current song, starting part-way through it
+        :param: position Position to start from, in nanoseconds
+        :return: Stream uri
+        '''
+        self.speaker.stop()
+        self.player.set_property("volume", VOLUME_DEFAULT)
+        mp3Stream = self.service.getStream(self.cur)
         self.player.set_property("uri", mp3Stream)
-        self.player.set_state(gst.STATE_PLAYING)
+        self.queued = None
+        self.service.prefetch(self.cur)
+        # seeking only works once the song has pre-rolled (this blocks, so it
+        # is only used on start-up and reconnect; never from the input thread)
+        self.setState(gst.STATE_PAUSED)
+        self.player.get_state(SEEK_TIMEOUT)
+        self.player.seek_simple(gst.FORMAT_TIME,
+            gst.SEEK_FLAG_FLUSH | gst.SEEK_FLAG_KEY_UNIT, position)
+        self.setState(gst.STATE_PLAYING)
         return mp3Stream
 
+    def position(self):
+        '''
+        Looks up how far into the current song the player is
+        :return: Position in nanoseconds or None if it is unknown
+        '''
+        try:
+            return self.player.query_position(gst.FORMAT_TIME, None)[0]
+        except gst.QueryError:
+            return None
+
+    def seek(self, delta):
+        '''
+        Moves forward or back within the current song (seeking past the end
+            moves on to the next song)
+        :param: delta Nanoseconds to move by (negative to go back)
+        :return: New position in nanoseconds or None if nothing is playing
+        '''
+        position = self.position()
+        if (position == None):
+            return None
+        position = max(position + delta, 0)
+        # the flush would drop the end of an announcement (leaving the mixer
+        # waiting on it), so it is cut short first
+        self.speaker.clipDone()
+        self.player.seek_simple(gst.FORMAT_TIME,
+            gst.SEEK_FLAG_FLUSH | gst.SEEK_FLAG_KEY_UNIT, position)
+        return position
+
+    def snapshot(self):
+        '''
+        Builds a record of what is playing, for restore()
+        :return: Dictionary that can be serialized to JSON
+        '''
+        pl = self.cur
+        state = {
+            "playlist"  : pl.name,
+            "shuffle"   : pl.isShuffle,
+            "track"     : None,
+        }
+        if (pl.isLoaded):
+            state["track"] = pl.currentTrack().name
+        return state
+
+    def shuffleOrder(self):
+        '''
+        Looks up the random play order of the current playlist, for restore()
+        :return: (playlist name, shuffle order) or None if it isn't shuffled
+        '''
+        pl = self.cur
+        if (pl.order == None):
+            return None
+        return (pl.name, pl.order)
+
+    def restore(self, state, order=None):
+        '''
+        Moves to the playlist and track recorded by snapshot() and restores
+            the shuffle state. Anything that no longer exists is skipped.
+        :param: state Dictionary built by snapshot()
+        :param: order (playlist name, shuffle order) recorded by
+            shuffleOrder() or None
+        :return: True if the track was restored
+        '''
+        name = fileStr(state.get("playlist", ""))
+        for pos, pl_id in enumerate(self.order):
+            if (self.playlists[pl_id].name == name):
+                self.cur_id = pos
+                self.cur = self.playlists[pl_id]
+                break
+        else:
+            return False
+        # all playlists should have the same shuffle state
+        if (bool(state.get("shuffle")) != self.cur.isShuffle):
+            for ids, pl in self.playlists.iteritems():
+                pl.shuffle()
+        track = state.get("track")
+        if (track == None):
+            return False
+        pl = self.cur
+        pl.load()
+        track = fileStr(track)
+        for idx, trk in enumerate(pl.tracks):
+            if (trk.name == track):
+                break
+        else:
+            return False
+        if ((order != None) and (fileStr(order[0]) == name)):
+            pl.setOrder(order[1])
+        pl.setCurrent(idx)
+        return True
+
     def pause(self):
         '''
         Pause the current song and return the unique id of the song playing
         :return: Stream uri
         '''
-        self.player.set_state(gst.STATE_PAUSED)
+        self.speaker.stop()
+        self.player.set_property("volume", VOLUME_DEFAULT)
+        self.setState(gst.STATE_PAUSED)
         return self.service.getStream(self.cur)
 
     def stop(self):
@@ -148,15 +483,21 @@ class Playback:
         Kills the current stream
         :return: Stream uri
         '''
-        self.player.set_state(gst.STATE_NULL)
+        self.speaker.stop()
+        self.player.set_property("volume", VOLUME_DEFAULT)
+        self.setState(gst.STATE_NULL)
         return self.service.getStream(self.cur)
 
     def playPause(self):
         '''
-        Plays/Pauses the song based on the current player state
+        Plays/Pauses the song based on the current player state (or the state
+            it is changing to, if a change is in flight)
         :return: Results of play() or pause()
         '''
-        if (self.player.get_state()[1] == gst.STATE_PLAYING):
+        state = self.state
+        if (self.changing):
+            state = self.target
+        if (state == gst.STATE_PLAYING):
             return self.pause()
         return self.play()
         
@@ -165,8 +506,8 @@ class Playback:
         Moves to the previous song (wraps-around) and returns that song
         :return: Results of play() function
         '''
-        # halt/remove the current song
-        self.player.set_state(gst.STATE_NULL)
+        # halt/remove the current song (READY keeps the audio device open)
+        self.setState(gst.STATE_READY)
         # change song in playlist 
         self.cur.prev()
         return self.play()
@@ -177,57 +518,147 @@ class Playback:
         :return: Results of play() function
         '''
         # perform similar actions as with prev()
-        self.player.set_state(gst.STATE_NULL)
+        self.setState(gst.STATE_READY)
         self.cur.next()
         return self.play()
 
+    def skip(self, delta):
+        '''
+        Moves a number of songs forward or back (wraps-around) and plays that
+            song
+        :param: delta Number of songs to move by (negative to go back)
+        :return: Results of play() function
+        '''
+        self.setState(gst.STATE_READY)
+        self.cur.move(delta)
+        return self.play()
+
+    def queueNext(self):
+        '''
+        Queues up the next song (wraps-around) to follow the current one
+            without a gap. Called by the player (from a streaming thread)
+            shortly before the current song ends, so it only reads the
+            playlist; advance() moves to the queued song afterwards.
+        :return: Stream uri
+        '''
+        pl = self.cur
+        self.queued = (pl, pl.peekIndex(1))
+        mp3Stream = self.service.getStream(pl, 1)
+        self.player.set_property("uri", mp3Stream)
+        return mp3Stream
+
+    def advance(self):
+        '''
+        Moves to the song queued up by queueNext(). Commands that ran in
+            between (such as a shuffle) may have changed what comes next in
+            the playlist, so the queued track is selected rather than the
+            next one. If another song was put on the player since, it stays.
+        '''
+        queued = self.queued
+        self.queued = None
+        if (queued == None):
+            return
+        pl, idx = queued
+        pl.setCurrent(idx)
+        self.service.prefetch(self.cur)
+
     def shuffle(self):
         '''
         Shuffles/deshuffles every playlist (keeps a consistent state across all
         '''
-        shuffle_TTS = True
         # play appropriate sound notification
         ttsFile = "file://" + self.shuffle_Files[not(self.cur.isShuffle)]
-        self.player.set_property("volume", VOLUME_SPEECH)
+        playing = (self.target == gst.STATE_PLAYING)
         # all playlists should have the same shuffle state
         for ids, pl in self.playlists.iteritems():
             pl.shuffle()
-        # play audio clip messaging
-        self.player.set_state(gst.STATE_NULL)
-        self.player.set_property("uri", ttsFile)
-        self.player.set_state(gst.STATE_PLAYING)
+        # the songs coming up are different now
+        self.service.prefetch(self.cur)
+        # play audio clip messaging over the current song (ducked, or held
+        # where it is if it isn't playing). The music keeps going if the
+        # notification isn't available (yet).
+        self.announce(ttsFile, playing)
 
-    def prevPl(self):
+    def jumpPl(self, pos):
         '''
-        Moves to the previous Playlist (wraps-around) and returns that song
+        Moves directly to a Playlist, by its position in the ordering
+            (wraps-around) and plays it
+        :param: pos Position of the playlist to play
         :return: Results of play() function
         '''
         # attempt to play the identifying playlist name
         self.pl_TTS = True
-        # halt/remove the current song
-        self.player.set_state(gst.STATE_NULL)
+        # halt/remove the current song (READY keeps the audio device open)
+        self.setState(gst.STATE_READY)
         # change playlist
-        if (self.cur_id == 0):
-            self.cur_id = len(self.playlists.keys()) - 1
-        else:
-            self.cur_id -= 1
-        self.cur = self.playlists[self.playlists.keys()[self.cur_id]]
+        self.cur_id = pos % len(self.order)
+        self.cur = self.playlists[self.order[self.cur_id]]
         return self.play()
 
+    def movePl(self, delta):
+        '''
+        Moves a number of Playlists forward or back (wraps-around) and plays
+            that playlist
+        :param: delta Number of playlists to move by (negative to go back)
+        :return: Results of play() function
+        '''
+        return self.jumpPl(self.cur_id + delta)
+
+    def scrollPl(self, delta):
+        '''
+        Moves a number of Playlists forward or back (wraps-around) while the
+            user scrolls through them. The new playlist is announced right
+            away, but its music is held back until endScroll().
+        :param: delta Number of playlists to move by (negative to go back)
+        :return: Location of the playlist's text-to-speech file
+        '''
+        # halt/remove the current song (READY keeps the audio device open)
+        self.setState(gst.STATE_READY)
+        self.cur_id = (self.cur_id + delta) % len(self.order)
+        self.cur = self.playlists[self.order[self.cur_id]]
+        # the player has to run for the announcement to be heard; the new
+        # song runs muted under it (see announce())
+        self.player.set_property("uri", self.service.getStream(self.cur))
+        self.queued = None
+        ttsFile = self.cur.ttsFile
+        if (ttsFile == None):
+            ttsFile = self.mkPlaylistTTS(self.cur)
+        self.announce(ttsFile, False)
+        return ttsFile
+
+    def endScroll(self):
+        '''
+        Plays the playlist that was scrolled to (see scrollPl()). If its name
+            is still being announced, the song starts once it has finished.
+        :return: Stream uri
+        '''
+        if not(self.speaker.whenDone(self.restart)):
+            return self.play()
+        self.service.prefetch(self.cur)
+        return self.service.getStream(self.cur)
+
+    def restart(self):
+        '''
+        Takes the (muted) song back to its start and brings the music in, once
+            the announcement playing over it has finished
+        '''
+        self.player.seek_simple(gst.FORMAT_TIME,
+            gst.SEEK_FLAG_FLUSH | gst.SEEK_FLAG_KEY_UNIT, 0)
+        self.player.set_property("volume", VOLUME_DEFAULT)
+
+    def prevPl(self):
+        '''
+        Moves to the previous Playlist (wraps-around) and returns that song
+        :return: Results of play() function
+        '''
+        return self.jumpPl(self.cur_id - 1)
+
     def nextPl(self):
         '''
         Moves to the next Playlist (wraps-around) and returns that song
         :return: Results of play() function
         '''
-        # perform similar actions as with prevPl()
-        self.pl_TTS = True
-        self.player.set_state(gst.STATE_NULL)
-        if (self.cur_id == (len(self.playlists.keys()) - 1 )):
-            self.cur_id = 0
-        else:
-            self.cur_id += 1
-        self.cur = self.playlists[self.playlists.keys()[self.cur_id]]
-        return self.play()
+        return self.jumpPl(self.cur_id + 1)
 
 def main():
     '''
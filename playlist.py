@@ -1,7 +1,7 @@
 #/usr/bin/python
 from __future__ import print_function
 import random
-import copy
+from array import array
 '''
 playlist.py
 Python class that represents a playlist
@@ -13,50 +13,160 @@ class Playlist:
     '''
     Class that represents a playlist to be played by the Pi
     '''
-    def __init__(self, id, name, tracks):
+    def __init__(self, id, name, tracks, loader=None):
         '''
         Constructor
         :param: id Playlist unique id (unique to streaming service)
         :param: name Name of the playlist
-        :param: tracks List of track objects
+        :param: tracks List of track objects. May be None if a loader is
+            provided, in which case the tracks are built on first use.
+        :param: loader (Optional) Function that takes this playlist and
+            returns its list of track objects
         '''
         self.id = id
         self.name = name
-        # keep two copies of the tracks (used for suffling)
-        self.tracks_original = copy.deepcopy(tracks)
-        self.tracks_shuffle = copy.deepcopy(tracks)
+        self.loader = loader
         self.isShuffle = False
-        # default to pointing to the original
-        self.tracks = self.tracks_original
         # current track
         self.cur = 0
         # file that stores the text-to-speech read-out of the file (to be set
         # by the playback service)
         self.ttsFile = None
+        # tracks if the track list has been built yet
+        self.isLoaded = False
+        self.order = None
+        if (tracks != None):
+            self.setTracks(tracks)
+
+    def setTracks(self, tracks):
+        '''
+        Sets the list of tracks of this playlist
+        :param: tracks List of track objects. The list is kept as-is (not
+            copied); shuffling never reorders it.
+        '''
+        self.tracks = tracks
+        # play order, as indices into the track list. Only allocated while
+        # shuffled; otherwise tracks are played in list order.
+        self.order = None
+        # playlists may have been shuffled before their tracks were known
+        if (self.isShuffle):
+            self.mkOrder()
+        self.isLoaded = True
+
+    def mkOrder(self):
+        '''
+        Builds a new random play order (a permutation of the track indices)
+        '''
+        self.order = array('I', range(len(self.tracks)))
+        random.shuffle(self.order)
+
+    def setOrder(self, order):
+        '''
+        Restores a (saved) random play order. Ignored unless the playlist is
+            shuffled and the order is a permutation of the track indices.
+        :param: order List of track indices
+        :return: True if the order was restored
+        '''
+        self.load()
+        if ((not(self.isShuffle)) or
+                (sorted(order) != list(range(len(self.tracks))))):
+            return False
+        self.order = array('I', order)
+        return True
+
+    def load(self):
+        '''
+        Builds the tracks of a lazily loaded playlist (if not done already)
+        '''
+        if not(self.isLoaded):
+            self.setTracks(self.loader(self))
 
     def __str__(self):
         '''
         __str__
         :return: String representation of a Playlist
         '''
+        self.load()
         trackStr = ""
-        for track in self.tracks:
-            trackStr += str(track) + ", "
+        for pos in range(len(self.tracks)):
+            trackStr += str(self.trackAt(pos)) + ", "
         return str(self.id) + ": " + self.name + " -> [ " + trackStr + " ]"
 
+    def trackAt(self, pos):
+        '''
+        Looks up a track by its position in the play order
+        :param: pos Position in the play order
+        :return: Track object
+        '''
+        if (self.order != None):
+            return self.tracks[self.order[pos]]
+        return self.tracks[pos]
+
+    def currentTrack(self):
+        '''
+        Return the current track (to play)
+        :return: Track object of the song to play
+        '''
+        self.load()
+        return self.trackAt(self.cur)
+
+    def setCurrent(self, idx):
+        '''
+        Selects a track as the current track
+        :param: idx Index of the track in the track list
+        '''
+        self.load()
+        if (self.order != None):
+            self.cur = self.order.index(idx)
+        else:
+            self.cur = idx
+
     def current(self):
         '''
         Return the unique id of the current song (to play)
         :return: Unique id of the song to play
         '''
-        song_id = self.tracks[self.cur].id
-        return song_id
+        return self.currentTrack().id
+
+    def peekIndex(self, offset):
+        '''
+        Looks ahead (or behind) in the play order without moving
+            (wraps-around)
+        :param: offset Number of songs away from the current one
+        :return: Index of the track in the track list (for setCurrent())
+        '''
+        self.load()
+        pos = (self.cur + offset) % len(self.tracks)
+        if (self.order != None):
+            return self.order[pos]
+        return pos
+
+    def peek(self, offset):
+        '''
+        Looks ahead (or behind) in the play order without moving
+            (wraps-around)
+        :param: offset Number of songs away from the current one
+        :return: Track object
+        '''
+        return self.tracks[self.peekIndex(offset)]
+
+    def move(self, delta):
+        '''
+        Moves a number of songs forward or back (wraps-around) and returns
+            that song
+        :param: delta Number of songs to move by (negative to go back)
+        :return: Unique id of the song to play
+        '''
+        self.load()
+        self.cur = (self.cur + delta) % len(self.tracks)
+        return self.current()
 
     def prev(self):
         '''
         Moves to the previous song (wraps-around) and returns that song
         :return: Unique id of the song to play
         '''
+        self.load()
         if (self.cur == 0):
             self.cur = len(self.tracks) - 1
         else:
@@ -68,6 +178,7 @@ class Playlist:
         Moves to the next song (wraps-around) and returns that song
         :return: Unique id of the song to play
         '''
+        self.load()
         if (self.cur == (len(self.tracks) - 1)):
             self.cur = 0
         else:
@@ -80,11 +191,18 @@ class Playlist:
         :return: Unique id of the song to play
         '''
         self.isShuffle = not(self.isShuffle)
+        # unloaded playlists pick up the shuffle state when they are loaded
+        if not(self.isLoaded):
+            return
+        # the current track stays current (at its new place in the order)
+        idx = self.cur
+        if (self.order != None):
+            idx = self.order[self.cur]
         if (self.isShuffle):
-            random.shuffle(self.tracks_shuffle)
-            self.tracks = self.tracks_shuffle
+            self.mkOrder()
         else:
-            self.tracks = self.tracks_original
+            self.order = None
+        self.setCurrent(idx)
 
 def main():
     '''
@@ -0,0 +1,220 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import io
+import os
+try:
+    from urllib import unquote
+except ImportError:
+    from urllib.parse import unquote
+# Local imports
+from jsonstore import nativeStr
+from libscanner import listEntries, listTracks, FILE_TYPES
+
+'''
+plsources.py
+Python classes that turn entries in the local music directory into playlists.
+    Each source recognizes one kind of entry (a directory, a playlist file,
+    etc.) and knows how to list the tracks in it.
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+class PlaylistSource:
+    '''
+    Class that "enforces" a common interface for all playlist sources
+        Sources report the tracks of a playlist as paths relative to the
+        playlist's base directory (absolute paths are allowed), along with the
+        modification times of everything the listing depends on. A cached
+        listing stays valid for as long as those modification times do.
+    '''
+    def match(self, name, isFile, isDir):
+        '''
+        Checks if an entry in the music directory belongs to this source
+        :param: name Name of the entry
+        :param: isFile True if the entry is a regular file
+        :param: isDir True if the entry is a directory
+        :return: True if this source handles the entry
+        '''
+        return False
+
+    def title(self, name):
+        '''
+        Builds the name of the playlist, as presented to the user
+        :param: name Name of the entry in the music directory
+        :return: Playlist name
+        '''
+        return name
+
+    def baseDir(self, root, name):
+        '''
+        Directory that track paths are relative to
+        :param: root Path to the music directory
+        :param: name Name of the entry in the music directory
+        :return: Path to the base directory
+        '''
+        return os.path.join(root, name)
+
+    def scan(self, root, name):
+        '''
+        Lists the tracks of a playlist
+        :param: root Path to the music directory
+        :param: name Name of the entry in the music directory
+        :return: Tuple of (dependencies, tracks). Dependencies map paths
+            (relative to the music directory) to modification times.
+        '''
+        # "Enforce" interface
+        raise Exception("scan() not implemented for source "
+            + self.__class__.__name__)
+
+class DirectorySource(PlaylistSource):
+    '''
+    A directory is a playlist of the tracks directly inside it
+    '''
+    def match(self, name, isFile, isDir):
+        '''
+        Checks if an entry in the music directory belongs to this source
+        :param: name Name of the entry
+        :param: isFile True if the entry is a regular file
+        :param: isDir True if the entry is a directory
+        :return: True if this source handles the entry
+        '''
+        return isDir
+
+    def scan(self, root, name):
+        '''
+        Lists the tracks of a playlist
+        :param: root Path to the music directory
+        :param: name Name of the entry in the music directory
+        :return: Tuple of (dependencies, tracks)
+        '''
+        pl_path = os.path.join(root, name)
+        deps = { name : os.stat(pl_path).st_mtime }
+        return (deps, listTracks(pl_path))
+
+class RecursiveSource(DirectorySource):
+    '''
+    A directory is a playlist of every track anywhere below it (for example,
+        an artist directory with a sub-directory per album)
+    '''
+    def scan(self, root, name):
+        '''
+        Lists the tracks of a playlist
+        :param: root Path to the music directory
+        :param: name Name of the entry in the music directory
+        :return: Tuple of (dependencies, tracks)
+        '''
+        deps = {}
+        tracks = []
+        # (device, inode) of every directory walked; a directory reached
+        # again through a symlink (such as "up -> ..") is only listed once
+        visited = set()
+        # walk the tree, one directory listing per directory
+        pending = [name]
+        while (len(pending) > 0):
+            rel = pending.pop()
+            dir_path = os.path.join(root, rel)
+            st = os.stat(dir_path)
+            if ((st.st_dev, st.st_ino) in visited):
+                continue
+            visited.add((st.st_dev, st.st_ino))
+            deps[rel] = st.st_mtime
+            for entry, isFile, isDir in listEntries(dir_path):
+                if (isDir):
+                    pending.append(os.path.join(rel, entry))
+                elif ((isFile) and (entry.endswith(FILE_TYPES))):
+                    tracks.append(os.path.relpath(os.path.join(rel, entry),
+                        name))
+        tracks.sort()
+        return (deps, tracks)
+
+class PlaylistFileSource(PlaylistSource):
+    '''
+    An M3U or PLS file is a playlist of the tracks it references. Tracks may
+        live anywhere on disk; relative paths are relative to the file.
+    '''
+    # File types of supported playlist files
+    EXTENSIONS = ('.m3u', '.m3u8', '.pls')
+
+    def match(self, name, isFile, isDir):
+        '''
+        Checks if an entry in the music directory belongs to this source
+        :param: name Name of the entry
+        :param: isFile True if the entry is a regular file
+        :param: isDir True if the entry is a directory
+        :return: True if this source handles the entry
+        '''
+        return ((isFile) and (name.lower().endswith(self.EXTENSIONS)))
+
+    def title(self, name):
+        '''
+        Builds the name of the playlist (the file name, minus the extension)
+        :param: name Name of the entry in the music directory
+        :return: Playlist name
+        '''
+        return os.path.splitext(name)[0]
+
+    def baseDir(self, root, name):
+        '''
+        Directory that track paths are relative to (where the file is)
+        :param: root Path to the music directory
+        :param: name Name of the entry in the music directory
+        :return: Path to the base directory
+        '''
+        return os.path.dirname(os.path.join(root, name))
+
+    def scan(self, root, name):
+        '''
+        Lists the tracks of a playlist
+        :param: root Path to the music directory
+        :param: name Name of the entry in the music directory
+        :return: Tuple of (dependencies, tracks)
+        '''
+        pl_path = os.path.join(root, name)
+        deps = { name : os.stat(pl_path).st_mtime }
+        with io.open(pl_path, "r", encoding="utf-8-sig",
+                errors="replace") as fd:
+            lines = [line.strip() for line in fd]
+        if (name.lower().endswith(".pls")):
+            entries = self.parsePLS(lines)
+        else:
+            entries = [line for line in lines
+                if ((len(line) > 0) and not(line.startswith(u"#")))]
+        tracks = []
+        for entry in entries:
+            entry = nativeStr(entry)
+            if (entry.startswith("file://")):
+                entry = unquote(entry[len("file://"):])
+            # skip any other kind of URL
+            elif ("://" in entry):
+                continue
+            tracks.append(entry.replace("\\", "/"))
+        return (deps, tracks)
+
+    def parsePLS(self, lines):
+        '''
+        Pulls the track entries out of a PLS file, in order
+        :param: lines Lines of the file
+        :return: List of track locations
+        '''
+        entries = []
+        for line in lines:
+            key, sep, value = line.partition(u"=")
+            if ((sep) and (key.lower().startswith(u"file"))):
+                try:
+                    entries.append((int(key[len(u"file"):]), value.strip()))
+                except ValueError:
+                    continue
+        entries.sort()
+        return [value for num, value in entries]
+
+# Sources are tried in order; the first one that matches an entry wins
+DEFAULT_SOURCES = (PlaylistFileSource(), RecursiveSource())
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import os
+import threading
+import ctypes
+import ctypes.util
+from collections import OrderedDict
+
+'''
+prefetch.py
+Python class that warms the page cache for files that are about to be played,
+    so that starting a track does not stall on (SD card) storage
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Number of upcoming tracks to warm
+PREFETCH_TRACKS = 3
+# Bytes to warm from the start of each track; the player reads sequentially
+# from there, which the kernel's own read-ahead keeps up with
+PREFETCH_HEAD = 2 * 1024 * 1024
+# Most bytes to keep warmed at once (across all tracks)
+PREFETCH_BUDGET = 16 * 1024 * 1024
+# Linux value of POSIX_FADV_WILLNEED
+FADV_WILLNEED = 3
+# Chunk size used when falling back to reading files
+READ_CHUNK = 64 * 1024
+
+def mkAdvise():
+    '''
+    Finds a way to ask the kernel to read part of a file into the page cache
+    :return: Function that takes (fd, offset, length), or None if the kernel
+        can't be asked (in which case the file is read instead)
+    '''
+    if (hasattr(os, "posix_fadvise")):
+        return lambda fd, offset, length: os.posix_fadvise(fd, offset,
+            length, os.POSIX_FADV_WILLNEED)
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        # the 64-bit variant takes 64-bit offsets, even on 32-bit ARM
+        fadvise = libc.posix_fadvise64
+    except (OSError, AttributeError):
+        return None
+    fadvise.argtypes = [ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong,
+        ctypes.c_int]
+    return lambda fd, offset, length: fadvise(fd, offset, length,
+        FADV_WILLNEED)
+
+class Prefetcher:
+    '''
+    Class that warms files on a background thread. Only the latest request
+        matters; requests that come in while one is running replace any that
+        are still waiting.
+    '''
+    def __init__(self, head=PREFETCH_HEAD, budget=PREFETCH_BUDGET):
+        '''
+        Constructor
+        :param: head Bytes to warm from the start of each file
+        :param: budget Most bytes to keep warmed at once
+        '''
+        self.head = head
+        self.budget = budget
+        self.advise = mkAdvise()
+        # [path] -> bytes warmed, oldest first. Files are not warmed again
+        # until they fall out of the budget.
+        self.warmed = OrderedDict()
+        self.size = 0
+        # paths waiting to be warmed (swapped under the lock, as requests
+        # come in from the main loop)
+        self.pending = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def request(self, paths):
+        '''
+        Asks for files to be warmed (in order)
+        :param: paths List of paths
+        '''
+        with self.lock:
+            self.pending = paths
+        self.wakeup.set()
+        # the thread is only started once there is something to do
+        if (self.thread == None):
+            self.thread = threading.Thread(target=self.run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def warm(self, path):
+        '''
+        Warms the start of a file, keeping within the budget
+        :param: path Path to the file
+        '''
+        if (path in self.warmed):
+            return
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            length = min(os.fstat(fd).st_size, self.head)
+            if (self.advise != None):
+                self.advise(fd, 0, length)
+            else:
+                left = length
+                while (left > 0):
+                    data = os.read(fd, min(READ_CHUNK, left))
+                    if (len(data) < 1):
+                        break
+                    left -= len(data)
+        except OSError:
+            return
+        finally:
+            os.close(fd)
+        self.warmed[path] = length
+        self.size += length
+        # forget the oldest files; the kernel is free to drop them
+        while (self.size > self.budget):
+            old, oldLength = self.warmed.popitem(last=False)
+            self.size -= oldLength
+
+    def run(self):
+        '''
+        Prefetch thread loop
+        '''
+        while (True):
+            self.wakeup.wait()
+            self.wakeup.clear()
+            with self.lock:
+                paths = self.pending
+                self.pending = None
+            if (paths == None):
+                continue
+            for path in paths:
+                # a newer request takes over
+                if (self.pending != None):
+                    break
+                self.warm(path)
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
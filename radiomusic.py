@@ -48,10 +48,12 @@ class RadioService(MusicService):
         '''
         return self.stations
 
-    def getStream(self, playlist):
+    def getStream(self, playlist, offset=0):
         '''
         Retrieves the location of the (current) song to play
         :param: playlist Reference to Playlist object to use
+        :param: offset Number of songs past the current one (stations only
+            have the one stream)
         :return: Music stream location
         '''
         return STATION_DICT[playlist.name]
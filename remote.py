@@ -1,10 +1,10 @@
 #/usr/bin/python
 from __future__ import print_function
-import threading
+import signal
 import os
 from os.path import *
 # Linux's evdev module, wrapped for Python
-from evdev import InputDevice, categorize, ecodes, list_devices, KeyEvent
+from evdev import ecodes, KeyEvent
 # GStream object that runs music playing thread
 import gobject
 import gst
@@ -16,6 +16,14 @@ from musicservice import ServiceException
 from localmusic import LocalService
 from radiomusic import RadioService
 from playback import Playback
+from libwatcher import LibraryWatcher
+from phasetimer import PhaseTimer
+from devwatcher import DeviceWatcher
+from snapshot import Snapshot
+from latency import LatencyTracker
+from coalescer import Coalescer
+from keymap import Keymap, accelerate, PRESS_TAP, PRESS_HOLD, PRESS_REPEAT
+from dispatcher import Dispatcher, PRIORITY_EVENT
 from servocontrol import Switch
 
 '''
@@ -27,11 +35,31 @@ __author__ = "Schuyler Martin"
 
 # Hardware ID of the USB IR device
 USB_IR_ID = "20a0:0004"
+# Hardware IDs of the input devices to take commands from
+INPUT_IDS = (USB_IR_ID,)
 # Bluetooth device ID (used for detecting connection/disconnection)
 BT_DEV_ID = "48_E2_44_F3_E7_07"
-# Upon disconnecting with the bluetooth device, kill the app so that the
-# wrapping daemon script can start it back up
+# If the player can't be rebuilt after the bluetooth device reconnects, kill
+# the app so that the wrapping daemon script can start it back up
 BT_ERROR_CODE = 22
+# Seconds to wait for the bluetooth device to reconnect before falling back to
+# restarting the app (the connection signals aren't always delivered again)
+RECONNECT_TIMEOUT = 300
+# Start-up timings are appended to this file (in the cache directory)
+STARTUP_LOG = "startup.log"
+# Queue up the next song before the current one ends, so that songs play back
+# to back without the player being torn down in between
+GAPLESS = True
+# What is playing is recorded to this file (in the cache directory) whenever
+# it changes, and picked back up on start-up. Where the song is at is only
+# recorded every POSITION_INTERVAL seconds; the shuffle order of the current
+# playlist is kept in its own file, written when the playlist is reshuffled
+SNAPSHOT_FILE = "playback.snapshot"
+SNAPSHOT_ORDER_FILE = "playback.order"
+POSITION_INTERVAL = 60
+# Command latency histograms are appended to this file (in the cache
+# directory) on SIGUSR1
+LATENCY_LOG = "latency.log"
 # Mapping enumerated actions to the IR buttons from the remote
 IR_MAP = {
     # Command   : USB firmware mapping  # Actual button on remote
@@ -47,6 +75,36 @@ IR_MAP = {
     'enter'     :   ecodes.KEY_ENTER,   # * (center)
     'return'    :   ecodes.KEY_X,       # Return
 }
+# Default actions of the IR buttons, by type of press. A keymap file (in the
+# run directory) replaces these; see keymap.py for the format
+IR_ACTIONS = {
+    'play'      : { PRESS_TAP : 'playPause', PRESS_HOLD : 'stop' },
+    'next'      : { PRESS_TAP : 'nextTrack', PRESS_REPEAT : 'seekForward' },
+    'prev'      : { PRESS_TAP : 'prevTrack', PRESS_REPEAT : 'seekBack' },
+    'stop'      : { PRESS_TAP : 'shuffle' },
+    'up'        : { PRESS_TAP : 'nextService' },
+    'down'      : { PRESS_TAP : 'prevService' },
+    'left'      : { PRESS_TAP : 'prevPlaylist', PRESS_REPEAT : 'scrollBack' },
+    'right'     : { PRESS_TAP : 'nextPlaylist',
+                    PRESS_REPEAT : 'scrollForward' },
+}
+KEYMAP_FILE = "keymap.json"
+# Kinds of moves that bursts of presses are merged into
+MOVE_TRACK = "track"
+MOVE_PLAYLIST = "playlist"
+# a scroll moves (and announces) the playlist as it goes; the burst only holds
+# back its music
+MOVE_SCROLL = "scroll"
+# Actions that move through songs and playlists (any other action settles
+# the pending move first)
+MOVE_ACTIONS = ('nextTrack', 'prevTrack', 'nextPlaylist', 'prevPlaylist',
+    'scrollForward', 'scrollBack')
+# Holding a button seeks SEEK_STEP seconds every SEEK_EVERY key repeats, and
+# scrolls one playlist every SCROLL_EVERY key repeats (both speed up the
+# longer the button is held)
+SEEK_STEP = 1
+SEEK_EVERY = 4
+SCROLL_EVERY = 8
 
 class Remote():
     '''
@@ -58,20 +116,41 @@ class Remote():
         :param: run_dir Path for the local music service's directory
         '''
         self.run_dir = run_dir
+        self.cachePath = self.run_dir + ".mood_switch_cache/"
+        # time each step of start-up so slow restarts can be explained
+        self.startup = PhaseTimer("Startup")
         # register the music playing thread
         self.main_loop = gobject.MainLoop()
         # see "MUSIC RUN LOOP" label below for further context
         gobject.threads_init()
 
-        # initialize input device (IR remote control)
-        self.devices = self.dev_init()
-        # input thread for remote_control
-        self.in_thread = threading.Thread(target=self.run_input)
-        # setting this variable guarantees the interpetter will handle thread
-        # clean-up on killing this program
-        self.in_thread.daemon = True
+        # initialize input device (IR remote control). It is read from the
+        # main loop, and picked back up if it is unplugged and plugged back in
+        with self.startup.phase("dev_init"):
+            self.inputs = DeviceWatcher(INPUT_IDS, self.keyEvent)
+            self.inputs.start()
         # service in use
         self.cur_id = 0
+        self.snapshot = Snapshot(self.cachePath + SNAPSHOT_FILE,
+            self.cachePath + SNAPSHOT_ORDER_FILE)
+        # tracks if the player is shut down, waiting for the bluetooth device
+        # to come back (and where to resume the current song from)
+        self.parked = False
+        self.resumeAt = None
+        self.reconnectTimer = None
+        # time commands from key-up to playback; dumped on request
+        self.latency = LatencyTracker()
+        signal.signal(signal.SIGUSR1, self.dumpLatency)
+        # remote input and player events are all run, one at a time, on the
+        # main loop (so the playback state is only ever touched from there)
+        self.dispatcher = Dispatcher(self.latency)
+        # bursts of song/playlist moves are only played once they settle
+        self.moves = Coalescer(self.applyMove)
+        # button presses -> actions, and the number of times each button
+        # being held has repeated
+        self.actions = self.mkActions()
+        self.keymap = self.init_keymap()
+        self.repeats = {}
         # init music services (Playback devices)
         self.services = self.init_services()
         # check to see if a service is available
@@ -80,38 +159,85 @@ class Remote():
         # if start playing music!
         else:
             # initialize event handling
-            bus = self.player.get_bus()
-            bus.enable_sync_message_emission()
-            bus.add_signal_watch()
-            bus.connect("message", self.msgEvent)
-            self.services[self.cur_id].playPause()
+            self.connectPlayer()
+            # pick up where playback stopped before the last restart
+            with self.startup.phase("first_play"):
+                position = self.restoreSnapshot()
+                if ((position != None) and (position > 0)):
+                    self.services[self.cur_id].playFrom(position)
+                else:
+                    self.services[self.cur_id].playPause()
+            self.saveSnapshot()
+            gobject.timeout_add_seconds(POSITION_INTERVAL, self.savePosition)
+        self.startup.log(self.cachePath + STARTUP_LOG)
     
-    def hwd_id(self, i):
+    def connectPlayer(self):
+        '''
+        Hooks the music player's events up to the remote
+        '''
+        bus = self.player.get_bus()
+        bus.enable_sync_message_emission()
+        bus.add_signal_watch()
+        bus.connect("message", self.msgEvent)
+        if (GAPLESS):
+            self.player.connect("about-to-finish", self.finishEvent)
+        self.latency.watch(self.player)
+
+    def disconnected(self):
         '''
-        Formats part of a hardware id (to 4 hex digits)
-        :param: i Decimal integer
-        :return: 4-digit hex string (with no 0x prefix)
+        Handles the bluetooth device disconnecting by shutting the players
+            down (freeing the audio device) until it comes back
         '''
-        hexStr = hex(i)[2:]
-        while len(hexStr) < 4:
-            hexStr = "0" + hexStr
-        return hexStr
+        if ((self.parked) or (len(self.services) < 1)):
+            return
+        self.saveSnapshot()
+        self.savePosition()
+        self.resumeAt = self.services[self.cur_id].position()
+        self.parked = True
+        self.speaker.stop()
+        self.player.set_state(gst.STATE_NULL)
+        self.reconnectTimer = gobject.timeout_add_seconds(RECONNECT_TIMEOUT,
+            self.restart)
+
+    def connected(self):
+        '''
+        Handles the bluetooth device (re)connecting by building a new player
+            and resuming the current song where it left off
+        '''
+        if not(self.parked):
+            return
+        gobject.source_remove(self.reconnectTimer)
+        self.reconnectTimer = None
+        try:
+            player = Playback.constructPlayer(self.speaker)
+        except gst.ElementNotFoundError:
+            self.restart()
+        # make sure the old player has let go of the audio device
+        self.player.set_state(gst.STATE_NULL)
+        self.player.get_bus().remove_signal_watch()
+        self.player = player
+        for srv in self.services:
+            srv.setPlayer(player)
+        self.connectPlayer()
+        self.parked = False
+        if ((self.resumeAt != None) and (self.resumeAt > 0)):
+            self.services[self.cur_id].playFrom(self.resumeAt)
+        else:
+            self.services[self.cur_id].play()
 
-    def dev_init(self):
+    def restart(self):
         '''
-        Initializes information regarding available input devices
-        :return: Dictionary of input devices, indexed by hardware id
+        Last resort: kills the app so that the wrapping daemon script starts
+            it back up (and resumes from the snapshot)
         '''
-        devices = {}
-        # take the device listing and convert it to a dictionary, indexed by the
-        # vendor_id:product_id (as is seen via lsusb and other tools)
-        for dev in list_devices():
-            dev = InputDevice(dev)
-            v_id = self.hwd_id(dev.info[1])
-            p_id = self.hwd_id(dev.info[2])
-            id = str(v_id) + ":" + str(p_id)
-            devices[id] = dev
-        return devices
+        self.saveSnapshot()
+        self.savePosition()
+        self.main_loop.quit()
+        # this is by far the dirtiest way to kill a python script
+        # BUT the signal handler raises an exception when sys.exit() is
+        # used here and that doesn't properly return the correct error code
+        # to OS (to be picked up by the wrapping shell scripts)
+        os._exit(BT_ERROR_CODE)
 
     def msgEvent(self, bus, message):
         '''
@@ -120,18 +246,130 @@ class Remote():
         :param: message Message object from bus
         '''
         # if the song ends or encounters an error, try the next song
-        if ((message.type == gst.MESSAGE_EOS) or 
-                (message.type == gst.MESSAGE_ERROR)):
-            # if the TTS file is done playing, play the current song
-            if (self.services[self.cur_id].pl_TTS):
-                self.services[self.cur_id].pl_TTS = False
-                self.services[self.cur_id].play()
-            elif (self.services[self.cur_id].shuffle_TTS):
-                self.services[self.cur_id].shuffle_TTS = False
-                self.services[self.cur_id].play()
-            # else advance to the next song
+        # (announcements are mixed in before the sink, so they never end the
+        # stream). In gapless mode, songs only end here if the next one failed
+        # to queue
+        if (message.type == gst.MESSAGE_EOS):
+            self.dispatcher.post("bus:eos", self.songEnded,
+                priority=PRIORITY_EVENT)
+        elif (message.type == gst.MESSAGE_ERROR):
+            # an announcement that fails is just cut short
+            if (self.speaker.isClip(message.src)):
+                self.dispatcher.post("speech:error", self.speaker.clipDone,
+                    priority=PRIORITY_EVENT)
             else:
-                self.services[self.cur_id].next()
+                self.dispatcher.post("bus:error", self.songFailed,
+                    priority=PRIORITY_EVENT)
+        elif ((message.type == gst.MESSAGE_STATE_CHANGED)
+                and (message.src == self.player)):
+            self.dispatcher.post("bus:state", self.stateChanged, (message,),
+                priority=PRIORITY_EVENT)
+
+    def songEnded(self):
+        '''
+        Moves on from a song that ended (or failed to play)
+        '''
+        # While parked, every song would fail, so don't go through them
+        if ((self.parked) or (len(self.services) < 1)):
+            return
+        self.services[self.cur_id].next()
+        self.saveSnapshot()
+
+    def songFailed(self):
+        '''
+        Moves on from a song that failed to play, after letting everything
+            tracking the player know that its last state change won't complete
+        '''
+        for srv in self.services:
+            srv.error()
+        self.songEnded()
+
+    def stateChanged(self, message):
+        '''
+        Passes a state change of the music player on to everything tracking it
+        :param: message Message object from the player's bus
+        '''
+        if (self.parked):
+            return
+        for srv in self.services:
+            srv.stateChanged(message)
+        self.latency.stateChanged(message)
+
+    def dumpLatency(self, signum, frame):
+        '''
+        Handles SIGUSR1 by printing (and logging) the command latencies
+        :param: signum Signal number
+        :param: frame Current stack frame
+        '''
+        self.latency.log(self.cachePath + LATENCY_LOG)
+
+    def finishEvent(self, player):
+        '''
+        Handles the player's "about-to-finish" signal by queueing up the next
+            song (runs on a streaming thread). The uri has to be set before
+            returning, so that is done right here; moving the playlist along
+            is left to the main loop.
+        :param: player Music player
+        '''
+        srv = self.services[self.cur_id]
+        srv.queueNext()
+        self.dispatcher.post("about-to-finish", self.songQueued, (srv,),
+            priority=PRIORITY_EVENT)
+
+    def songQueued(self, srv):
+        '''
+        Moves the playlist along to the song queued up by finishEvent()
+        :param: srv Playback device the song was queued on
+        '''
+        srv.advance()
+        self.saveSnapshot()
+
+    def saveSnapshot(self):
+        '''
+        Records what is playing, if it has changed (called after anything
+            that can change the service, playlist, track or shuffle state)
+        '''
+        # the player is shut down while parked, so it can't say where it is;
+        # the snapshot taken on disconnecting is kept instead
+        if ((self.parked) or (len(self.services) < 1)):
+            return
+        srv = self.services[self.cur_id]
+        self.snapshot.save({
+            "service"   : srv.service.strType,
+            "playback"  : srv.snapshot(),
+        }, srv.shuffleOrder())
+
+    def savePosition(self):
+        '''
+        Records where the current song is at (called periodically from the
+            main loop)
+        :return: True to keep the timer alive
+        '''
+        if ((self.parked) or (len(self.services) < 1)):
+            return True
+        self.snapshot.savePosition(self.services[self.cur_id].position())
+        return True
+
+    def restoreSnapshot(self):
+        '''
+        Moves to the service, playlist and track that were playing before the
+            last restart
+        :return: Position in the current song to play from (in nanoseconds)
+            or None to play it from the start
+        '''
+        snapshot = self.snapshot.load()
+        if (snapshot == None):
+            return None
+        state, position, order = snapshot
+        if not(isinstance(state, dict)):
+            return None
+        for srv_id, srv in enumerate(self.services):
+            if (srv.service.strType == state.get("service")):
+                self.cur_id = srv_id
+                if (srv.restore(state.get("playback", {}), order)):
+                    return position
+                return None
+        return None
 
     def init_services(self):
         '''
@@ -143,27 +381,55 @@ class Remote():
         # attempt to initialize local service. If it fails, don't load that
         # service
         try:
-            cachePath = self.run_dir + ".mood_switch_cache/"
+            cachePath = self.cachePath
             # make directory if missing
             if not(os.path.exists(cachePath)):
                 os.makedirs(cachePath)
             # make services
-            local_service = LocalService(self.run_dir + "local_music/")
-            radio_service = RadioService()
+            with self.startup.phase("local_scan"):
+                local_service = LocalService(self.run_dir + "local_music/",
+                    cachePath, lazy=True)
+            with self.startup.phase("radio_init"):
+                radio_service = RadioService()
             # init a single player for all music services
-            self.player = Playback.constructPlayer()
-            # add services
-            services.append(Playback(self.player, local_service, cachePath))
+            with self.startup.phase("construct_player"):
+                self.speaker = Playback.constructSpeaker()
+                self.player = Playback.constructPlayer(self.speaker)
+            # text-to-speech files are cached and generated in the
+            # background, shared by all music services
+            self.tts = Playback.constructTTS(cachePath)
+            # add services (building a Playback runs its init_cache())
+            with self.startup.phase("init_cache:" + str(local_service)):
+                services.append(Playback(self.player, local_service,
+                    cachePath, self.tts, self.speaker))
+            # pick up changes to the local music directory without restarting
+            with self.startup.phase("watch_library"):
+                self.watcher = LibraryWatcher(local_service, self.libEvent)
+                self.watcher.start()
             # remote services, such as the radio service will constantly
             # throw errors if there is no X11 (although they appear to work)
             # So they are disabled if X11 is missing
             if (os.environ.get("DISPLAY") != None):
-                services.append(
-                    Playback(self.player, radio_service, cachePath))
+                with self.startup.phase("init_cache:" + str(radio_service)):
+                    services.append(Playback(self.player, radio_service,
+                        cachePath, self.tts, self.speaker))
+            # drop speech files no playlist has asked for in a long time
+            with self.startup.phase("tts_collect"):
+                self.tts.collect()
         except ServiceException:
             print("Warning: No local music found")
         return services
 
+    def libEvent(self):
+        '''
+        Handles playlists being added, removed or renamed in the local music
+            directory (called from the main loop by the library watcher)
+        '''
+        for srv in self.services:
+            if (srv.service is self.watcher.service):
+                srv.reindex()
+        self.tts.collect()
+
     def nextService(self):
         '''
         Moves to the next music service
@@ -192,52 +458,156 @@ class Remote():
         self.services[self.cur_id].play()
         return self.cur_id
 
-    def run_input(self):
-        # loop input reading from device
-        for event in self.devices[USB_IR_ID].read_loop():
-            # trigger event on key release as this is the end of a button press
-            # sequence (key_down -> key_hold(s) -> key_up)
-            if ((event != None) and (event.type == ecodes.EV_KEY) and 
-                    (event.value == KeyEvent.key_up)):
-                # interpret command
-                if (event.code == IR_MAP['light']):
-                    pass
-                # ignore music playing commands if there aren't any available 
-                # music services
-                if (len(self.services) > 0):
-                    # === Basic playback Control ===
-                    if (event.code == IR_MAP['play']):
-                        self.services[self.cur_id].playPause()
-                    elif (event.code == IR_MAP['next']):
-                        self.services[self.cur_id].next()
-                    elif (event.code == IR_MAP['prev']):
-                        self.services[self.cur_id].prev()
-                    # === Moving bewteen playlists ===
-                    elif (event.code == IR_MAP['left']):
-                        self.services[self.cur_id].prevPl()
-                    elif (event.code == IR_MAP['right']):
-                        self.services[self.cur_id].nextPl()
-                    # === Moving bewteen services ===
-                    # currently there is only one service available
-                    elif (event.code == IR_MAP['up']):
-                        self.nextService()
-                    elif (event.code == IR_MAP['down']):
-                        self.prevService()
-                    # shuffle current playlist
-                    elif (event.code == IR_MAP['stop']):
-                        self.services[self.cur_id].shuffle()
-                    # Ignore other inputs until they are written
-                    else:
-                        pass
+    def mkActions(self):
+        '''
+        Builds the table of actions that buttons can be mapped to
+        :return: Dictionary of action name -> function that takes the number
+            of times the key has repeated
+        '''
+        srv = lambda: self.services[self.cur_id]
+        return {
+            # === Basic playback Control ===
+            'playPause'     : lambda count: srv().playPause(),
+            'stop'          : lambda count: srv().stop(),
+            'shuffle'       : lambda count: srv().shuffle(),
+            # === Moving bewteen songs and playlists ===
+            'nextTrack'     : lambda count: self.moves.add(MOVE_TRACK, 1),
+            'prevTrack'     : lambda count: self.moves.add(MOVE_TRACK, -1),
+            'nextPlaylist'  : lambda count: self.moves.add(MOVE_PLAYLIST, 1),
+            'prevPlaylist'  : lambda count: self.moves.add(MOVE_PLAYLIST, -1),
+            'scrollForward' : lambda count: self.scroll(
+                accelerate(count, SCROLL_EVERY)),
+            'scrollBack'    : lambda count: self.scroll(
+                -accelerate(count, SCROLL_EVERY)),
+            # === Moving within a song ===
+            'seekForward'   : lambda count: self.seek(
+                accelerate(count, SEEK_EVERY)),
+            'seekBack'      : lambda count: self.seek(
+                -accelerate(count, SEEK_EVERY)),
+            # === Moving bewteen services ===
+            'nextService'   : lambda count: self.nextService(),
+            'prevService'   : lambda count: self.prevService(),
+        }
+
+    def init_keymap(self):
+        '''
+        Initializes the mapping of button presses to actions
+        :return: Keymap object
+        '''
+        keymap = Keymap()
+        for button, presses in IR_ACTIONS.items():
+            for press, action in presses.items():
+                keymap.bind(IR_MAP[button], press, action)
+        # a keymap file replaces the default mapping entirely
+        keymap.load(self.run_dir + KEYMAP_FILE, self.actions)
+        return keymap
+
+    def seek(self, steps):
+        '''
+        Moves forward or back within the current song
+        :param: steps Number of SEEK_STEPs to move by (negative to go back)
+        '''
+        if (steps != 0):
+            self.services[self.cur_id].seek(steps * SEEK_STEP * gst.SECOND)
+
+    def scroll(self, steps):
+        '''
+        Scrolls through the playlists while a button is held. Each playlist
+            scrolled to is announced right away; its music only starts once
+            the button has been let go for a moment (see applyMove()).
+        :param: steps Number of playlists to move by (negative to go back; 0
+            for repeats that don't move)
+        '''
+        # every repeat holds the music back a little longer. The burst counts
+        # how many playlists have gone by; the moves are made here.
+        self.moves.add(MOVE_SCROLL, abs(steps))
+        if (steps != 0):
+            self.services[self.cur_id].scrollPl(steps)
+
+    def applyMove(self, kind, delta):
+        '''
+        Performs the net move of a burst of presses
+        :param: kind Kind of move (MOVE_TRACK, MOVE_PLAYLIST or MOVE_SCROLL)
+        :param: delta Number of songs/playlists to move by (for a scroll, the
+            number of playlists that went by)
+        '''
+        # presses that cancelled each other out (or the bluetooth device went
+        # away while the burst was settling)
+        if ((delta == 0) or (len(self.services) < 1) or (self.parked)):
+            return
+        if (kind == MOVE_SCROLL):
+            self.services[self.cur_id].endScroll()
+        elif (kind == MOVE_PLAYLIST):
+            self.services[self.cur_id].movePl(delta)
+        else:
+            self.services[self.cur_id].skip(delta)
+        # the last press of the burst only takes effect now (a press that
+        # settled the burst early is marked by command())
+        self.latency.dispatched(MOVE_ACTIONS)
+        self.saveSnapshot()
+
+    def keyEvent(self, event):
+        '''
+        Handles a single input event by queueing up its command
+        :param: event Input event
+        '''
+        # a button press is a sequence of key_down -> key_hold(s) -> key_up.
+        # Releasing the button before it repeats is a tap
+        if ((event == None) or (event.type != ecodes.EV_KEY)):
+            return
+        code = event.code
+        if (event.value == KeyEvent.key_down):
+            self.repeats[code] = 0
+        elif (event.value == KeyEvent.key_hold):
+            count = self.repeats.get(code, 0) + 1
+            self.repeats[code] = count
+            if (count == 1):
+                self.press(code, PRESS_HOLD, count, event)
+            self.press(code, PRESS_REPEAT, count, event)
+        elif (event.value == KeyEvent.key_up):
+            if (self.repeats.pop(code, 0) == 0):
+                self.press(code, PRESS_TAP, 0, event)
+
+    def press(self, code, press, count, event):
+        '''
+        Queues up the action mapped to a button press (if there is one)
+        :param: code Key code of the button
+        :param: press Type of press
+        :param: count Number of times the key has repeated
+        :param: event Input event
+        '''
+        action = self.keymap.lookup(code, press)
+        if (action == None):
+            return
+        self.latency.start(action, event.timestamp())
+        self.dispatcher.post(action, self.command, (action, count))
+
+    def command(self, action, count):
+        '''
+        Runs a remote command (called from the main loop by the dispatcher)
+        :param: action Name of the action
+        :param: count Number of times the key has repeated
+        '''
+        # ignore music playing commands if there aren't any available 
+        # music services, or while parked (they would start the player back
+        # up without the bluetooth device)
+        if ((len(self.services) > 0) and not(self.parked)):
+            # bursts of moves are merged into one; anything else settles the
+            # pending move first
+            if not(action in MOVE_ACTIONS):
+                self.moves.flush()
+            self.actions[action](count)
+        # moves are only run once their burst settles (see applyMove())
+        if not(action in MOVE_ACTIONS):
+            self.latency.dispatched()
+        self.saveSnapshot()
 
     def run(self):
         '''
         Primary runtime control
         '''
-        # start looking for input in a separate thread. This allows us to do
-        # some smarter control with the music playback
-        self.in_thread.start()
-        # main runtime loop
+        # main runtime loop (input is read from here, along with the player's
+        # events)
         self.main_loop.run()
 
 def conEvent(iface=None, mbr=None, path=None):
@@ -249,12 +619,9 @@ def conEvent(iface=None, mbr=None, path=None):
     '''
     if ((iface == "org.bluez.AudioSink") and (path.find(BT_DEV_ID))):
         if (mbr == "Disconnected"):
-            remote.main_loop.quit()
-            # this is by far the dirtiest way to kill a python script
-            # BUT the signal handler raises an exception when sys.exit() is
-            # used here and that doesn't properly return the correct error code
-            # to OS (to be picked up by the wrapping shell scripts)
-            os._exit(BT_ERROR_CODE)
+            remote.disconnected()
+        elif (mbr == "Connected"):
+            remote.connected()
 
 def bt_init():
     '''
@@ -0,0 +1,103 @@
+#/usr/bin/python
+from __future__ import print_function
+# Local imports
+from jsonstore import loadJSON, saveJSON
+
+'''
+snapshot.py
+Python class that persists what is playing (service, playlist, track, position
+    and shuffle state) so that a restart can pick up where playback stopped
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Layout version of the snapshot files (see jsonstore.py)
+SNAPSHOT_VERSION = 3
+
+class Snapshot:
+    '''
+    Class that reads and writes the playback snapshot. What is playing and
+        where the song is at are kept in one file; the (much larger) shuffle
+        order of the current playlist is kept in a second file, so that it is
+        only written when the playlist is reshuffled or changed.
+    '''
+    def __init__(self, fileName, orderName):
+        '''
+        Constructor
+        :param: fileName Path to the snapshot file
+        :param: orderName Path to the shuffle order file
+        '''
+        self.fileName = fileName
+        self.orderName = orderName
+        # last state, position and order written (or read), to skip writing
+        # unchanged state
+        self.state = None
+        self.position = None
+        self.order = None
+
+    def load(self):
+        '''
+        Reads the snapshot in from disk
+        :return: (state dictionary, position, (playlist name, shuffle order))
+            or None if there is no (usable) snapshot. The position and order
+            are None if they weren't recorded.
+        '''
+        data = loadJSON(self.fileName, SNAPSHOT_VERSION)
+        if (data == None):
+            return None
+        self.state = data.get("state")
+        self.position = data.get("position")
+        order = loadJSON(self.orderName, SNAPSHOT_VERSION)
+        if ((order != None) and (order.get("order") != None)):
+            order = (order.get("playlist"), order["order"])
+        else:
+            order = None
+        return (self.state, self.position, order)
+
+    def save(self, state, order=None):
+        '''
+        Records what is playing, if it has changed. A change of what is
+            playing starts a new song, so the position is cleared (and
+            recorded again by savePosition()).
+        :param: state Dictionary that can be serialized to JSON
+        :param: order (playlist name, shuffle order) of the current playlist
+            or None if it isn't shuffled. Orders are replaced, never changed
+            in place, when a playlist is reshuffled, so they are compared by
+            identity rather than walked.
+        '''
+        if ((order != None) and ((self.order == None) or
+                (order[0] != self.order[0]) or (order[1] is not self.order[1]))):
+            if (saveJSON(self.orderName, SNAPSHOT_VERSION, {
+                        "playlist"  : order[0],
+                        "order"     : list(order[1]),
+                    }, "playback snapshot")):
+                self.order = order
+        if (state == self.state):
+            return
+        if (saveJSON(self.fileName, SNAPSHOT_VERSION, {
+                    "state"     : state,
+                    "position"  : None,
+                }, "playback snapshot")):
+            self.state = state
+            self.position = None
+
+    def savePosition(self, position):
+        '''
+        Records where the current song is at (if it has moved)
+        :param: position Position in the current song (in nanoseconds)
+        '''
+        if ((self.state == None) or (position == self.position)):
+            return
+        if (saveJSON(self.fileName, SNAPSHOT_VERSION, {
+                    "state"     : self.state,
+                    "position"  : position,
+                }, "playback snapshot")):
+            self.position = position
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
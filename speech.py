@@ -0,0 +1,203 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import wave
+import audioop
+# GStreamer
+import pygst
+import gst
+# GStream object that runs music playing thread
+import gobject
+
+'''
+speech.py
+Python class that mixes short announcement clips (text-to-speech), held in
+    memory, in with the music. Music and speech share one pipeline and one
+    audio device; the device never changes hands for an announcement.
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Announcements are scaled to this RMS level (fraction of full scale)...
+SPEECH_RMS = 0.25
+# ...so long as their peaks stay under this level
+SPEECH_PEAK = 0.95
+# ALSA device that music and announcements are played on (the bluetooth
+# speaker). Notes to self about bluetooth:
+# - config for alsa is set is /etc/asound.conf
+# - confic for bluetooth audio is /etc/bluetooth/audio.conf
+# - bluetooth daemon: /etc/init.d/bluetooth 
+# - also make sure that there are no other connections to the speaker
+AUDIO_DEVICE = "bluetooth"
+# Format music and speech are mixed in (adder needs every input to match)
+MIX_CAPS = ("audio/x-raw-int,rate=44100,channels=2,width=16,depth=16,"
+    + "signed=true,endianness=1234")
+
+def normalizeWav(fileName, rms=SPEECH_RMS, peak=SPEECH_PEAK):
+    '''
+    Loudness-normalizes a wav file in place, so that announcements play at
+        the same level as the music without boosting the player's volume
+    :param: fileName Path to the wav file
+    :param: rms Target RMS level (fraction of full scale)
+    :param: peak Highest allowed peak level (fraction of full scale)
+    '''
+    fd = wave.open(fileName, "rb")
+    try:
+        params = fd.getparams()
+        frames = fd.readframes(fd.getnframes())
+    finally:
+        fd.close()
+    width = params[1]
+    fullScale = float((1 << (8 * width - 1)) - 1)
+    curRms = audioop.rms(frames, width)
+    curPeak = audioop.max(frames, width)
+    # silence; nothing to scale
+    if ((curRms < 1) or (curPeak < 1)):
+        return
+    factor = min((rms * fullScale) / curRms, (peak * fullScale) / curPeak)
+    frames = audioop.mul(frames, width, factor)
+    fd = wave.open(fileName, "wb")
+    try:
+        fd.setparams(params)
+        fd.writeframes(frames)
+    finally:
+        fd.close()
+
+class SpeechPlayer:
+    '''
+    Class that builds the music player's audio sink: the music and the clip
+        being announced are mixed (by an adder) into a single alsasink.
+        Each clip gets a small branch of its own that is linked into the
+        mixer while it plays and removed once it has finished. There is only
+        ever one clip playing; a new clip cuts off the previous one.
+    '''
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        # audio sink of the music player, and the adder in it
+        self.sink = None
+        self.mixer = None
+        # branch playing the current clip, and the mixer pad it feeds
+        self.branch = None
+        self.pad = None
+        # function to call once the current clip has finished
+        self.onDone = None
+
+    def mkSink(self):
+        '''
+        Builds a (new) audio sink for the music player. Any clip playing in
+            the previous one is forgotten.
+        :return: GST bin to set as the player's "audio-sink"
+        '''
+        self.branch = None
+        self.pad = None
+        self.onDone = None
+        self.sink = gst.parse_bin_from_description("audioconvert"
+            + " ! audioresample ! capsfilter caps=" + MIX_CAPS
+            + " ! adder name=mix ! alsasink device=\"" + AUDIO_DEVICE + "\"",
+            True)
+        self.mixer = self.sink.get_by_name("mix")
+        return self.sink
+
+    def say(self, clip, onDone=None):
+        '''
+        Mixes a clip in with the music. It is only heard while the player is
+            playing.
+        :param: clip Contents of a wav file
+        :param: onDone (Optional) Function to call once the clip has finished
+        '''
+        self.stop()
+        branch = gst.parse_bin_from_description("appsrc name=src"
+            + " caps=audio/x-wav ! wavparse ! audioconvert ! audioresample"
+            + " ! capsfilter caps=" + MIX_CAPS, True)
+        self.sink.add(branch)
+        pad = self.mixer.get_request_pad("sink%d")
+        srcPad = branch.get_pad("src")
+        srcPad.link(pad)
+        # the mixer carries on without the branch once it has ended; it is
+        # taken out from the main loop
+        srcPad.add_event_probe(self.clipEvent, branch)
+        self.branch = branch
+        self.pad = pad
+        self.onDone = onDone
+        branch.sync_state_with_parent()
+        src = branch.get_by_name("src")
+        src.emit("push-buffer", gst.Buffer(clip))
+        src.emit("end-of-stream")
+
+    def whenDone(self, onDone):
+        '''
+        Replaces the completion function of the clip that is playing
+        :param: onDone Function to call once the clip has finished
+        :return: True if a clip is playing
+        '''
+        if (self.branch == None):
+            return False
+        self.onDone = onDone
+        return True
+
+    def stop(self):
+        '''
+        Cuts off the current clip (without calling its completion function)
+        '''
+        self.onDone = None
+        branch = self.branch
+        if (branch == None):
+            return
+        self.branch = None
+        # stops the branch's streaming thread before it is unlinked
+        branch.set_state(gst.STATE_NULL)
+        branch.get_pad("src").unlink(self.pad)
+        self.mixer.release_request_pad(self.pad)
+        self.pad = None
+        self.sink.remove(branch)
+
+    def isClip(self, element):
+        '''
+        Checks if an element (such as the source of a bus message) belongs to
+            the clip that is playing
+        :param: element GST element
+        :return: True if the element is part of the current clip's branch
+        '''
+        while ((element != None) and (self.branch != None)):
+            if (element == self.branch):
+                return True
+            element = element.get_parent()
+        return False
+
+    def clipEvent(self, pad, event, branch):
+        '''
+        Watches for the end of a clip (runs on a streaming thread)
+        :param: pad Source pad of the clip's branch
+        :param: event Event passing through the pad
+        :param: branch Branch of the clip
+        :return: True to let the event through
+        '''
+        if (event.type == gst.EVENT_EOS):
+            gobject.idle_add(self.clipDone, branch)
+        return True
+
+    def clipDone(self, branch=None):
+        '''
+        Takes out a clip that has finished (or failed) and calls its
+            completion function (called from the main loop)
+        :param: branch Branch of the clip; None for the current one
+        :return: False so that it only runs once
+        '''
+        if ((branch != None) and (branch != self.branch)):
+            # cut off since
+            return False
+        onDone = self.onDone
+        self.stop()
+        if (onDone != None):
+            onDone()
+        return False
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
@@ -8,18 +8,24 @@ Python class that represents a single track/song
 '''
 __author__ = "Schuyler Martin"
 
-class Track:
+class Track(object):
     '''
     Class that represents a track/song to be played by the Pi
     '''
-    def __init__(self, id, name):
+    # there can be a lot of these; skip the per-instance dictionary
+    __slots__ = ('id', 'name', 'meta')
+
+    def __init__(self, id, name, meta=None):
         '''
         Constructor
         :param: id Track unique id (unique to streaming service or playlist)
         :param: name Name of the track
+        :param: meta (Optional) Dictionary of metadata (title, artist, album,
+            duration in seconds); None if unknown
         '''
         self.id = id
         self.name = name
+        self.meta = meta
 
     def __str__(self):
         '''
@@ -0,0 +1,289 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+# Local imports
+from jsonstore import fileStr, loadJSON, saveJSON
+from ttsworker import TTSWorker, DEFAULT_WORKERS, PRIORITY_HIGH, TMP_SUFFIX
+
+'''
+ttscache.py
+Python class that keeps a bounded, content-addressed cache of text-to-speech
+    files on disk
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Layout version of the manifest file (see jsonstore.py)
+CACHE_VERSION = 2
+MANIFEST_FILE = "manifest.idx"
+# Most disk space (in bytes) the speech files may take up
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Entries not asked for in this long (in seconds) are considered orphaned;
+# e.g. a playlist that was renamed or deleted
+ORPHAN_AGE = 7 * 24 * 60 * 60
+# Number of speech clips kept in memory
+MAX_CLIPS = 32
+
+class TTSCache:
+    '''
+    Class that maps text to a text-to-speech file. Files are named by a hash
+        of the text and the synthesis parameters, so changing either never
+        hands back a stale file. A manifest tracks the size and last use of
+        every file; the least recently used files are evicted to keep the
+        cache under a size limit.
+    '''
+    def __init__(self, path, synth, params, maxBytes=DEFAULT_MAX_BYTES,
+            workers=DEFAULT_WORKERS):
+        '''
+        Constructor
+        :param: path Directory to store the speech files in
+        :param: synth Function that takes (text, fileName) and writes out a
+            text-to-speech file
+        :param: params String describing the synthesis parameters
+        :param: maxBytes Most disk space the speech files may take up
+        :param: workers Number of files to synthesize at once
+        '''
+        self.path = path
+        self.params = params
+        self.maxBytes = maxBytes
+        self.fileName = os.path.join(path, MANIFEST_FILE)
+        if not(os.path.exists(path)):
+            os.makedirs(path)
+        self.lock = threading.Lock()
+        # [key] -> [text, size in bytes, last used time]
+        self.entries = {}
+        # [file name] -> text of every file asked for since start-up, so that
+        # an evicted file can be regenerated on demand
+        self.texts = {}
+        self.dirty = False
+        # [file name] -> file contents of the most recently played clips
+        self.clips = OrderedDict()
+        self.load()
+        self.worker = TTSWorker(synth, workers, self.generated)
+
+    def load(self):
+        '''
+        Reads the manifest in from disk. A missing or corrupt manifest is
+            treated as an empty one (the files it described become orphans).
+        :return: True if a manifest was loaded, False otherwise
+        '''
+        data = loadJSON(self.fileName, CACHE_VERSION)
+        if ((data == None) or (data.get("params") != self.params)):
+            return False
+        entries = {}
+        for key, entry in data.get("entries", {}).items():
+            entries[fileStr(key)] = [fileStr(entry[0]), entry[1],
+                entry[2]]
+        with self.lock:
+            self.entries = entries
+            self.dirty = False
+        return True
+
+    def save(self):
+        '''
+        Writes the manifest out to disk (only if something has changed)
+        '''
+        with self.lock:
+            if not(self.dirty):
+                return
+            data = {
+                "params"    : self.params,
+                "entries"   : dict(self.entries),
+            }
+            self.dirty = False
+        saveJSON(self.fileName, CACHE_VERSION, data, "speech cache manifest")
+
+    def key(self, text):
+        '''
+        Builds the cache key of some text
+        :param: text Text to synthesize
+        :return: Hex digest of the text and the synthesis parameters
+        '''
+        if not(isinstance(text, bytes)):
+            text = text.encode("utf-8")
+        return hashlib.sha1(self.params.encode("utf-8") + b"\0"
+            + text).hexdigest()
+
+    def filePath(self, key):
+        '''
+        Builds the path of the speech file for a key
+        :param: key Cache key
+        :return: Path to the speech file
+        '''
+        return os.path.join(self.path, key + ".wav")
+
+    def request(self, text):
+        '''
+        Looks up the speech file for some text, queueing it to be generated if
+            it is missing
+        :param: text Text to synthesize
+        :return: Path to the speech file (which may not exist yet)
+        '''
+        key = self.key(text)
+        fileName = self.filePath(key)
+        self.texts[fileName] = text
+        with self.lock:
+            entry = self.entries.get(key)
+            if (entry != None):
+                entry[2] = time.time()
+                self.dirty = True
+        self.worker.submit(text, fileName)
+        return fileName
+
+    def wait(self, fileName, timeout):
+        '''
+        Waits (a bounded amount of time) for a speech file to be generated,
+            regenerating it first if it has been evicted
+        :param: fileName Path to the speech file
+        :param: timeout Maximum time to wait, in seconds
+        :return: True if the file is ready
+        '''
+        key = os.path.splitext(os.path.basename(fileName))[0]
+        with self.lock:
+            entry = self.entries.get(key)
+            if (entry != None):
+                entry[2] = time.time()
+                self.dirty = True
+        if (not(self.worker.isQueued(fileName))
+                and not(os.path.exists(fileName))
+                and (fileName in self.texts)):
+            self.worker.submit(self.texts[fileName], fileName, PRIORITY_HIGH)
+        return self.worker.wait(fileName, timeout)
+
+    def waitIdle(self):
+        '''
+        Blocks until every queued file has been generated
+        '''
+        self.worker.waitIdle()
+
+    def clip(self, fileName):
+        '''
+        Fetches the contents of a speech file, from memory if it was played
+            recently
+        :param: fileName Path to the speech file
+        :return: File contents or None if the file could not be read
+        '''
+        with self.lock:
+            data = self.clips.pop(fileName, None)
+        if (data == None):
+            try:
+                with open(fileName, "rb") as fd:
+                    data = fd.read()
+            except (IOError, OSError):
+                return None
+        with self.lock:
+            self.clips[fileName] = data
+            if (len(self.clips) > MAX_CLIPS):
+                self.clips.popitem(last=False)
+        return data
+
+    def generated(self, fileName, success):
+        '''
+        Records a newly generated file (called from a worker thread) and
+            evicts old files if the cache is over its size limit
+        :param: fileName Path to the speech file
+        :param: success True if the file was written
+        '''
+        if not(success):
+            return
+        key = os.path.splitext(os.path.basename(fileName))[0]
+        try:
+            size = os.path.getsize(fileName)
+        except OSError:
+            return
+        with self.lock:
+            self.entries[key] = [self.texts.get(fileName, ""), size,
+                time.time()]
+            self.dirty = True
+        self.evict(keep=key)
+        # batch manifest writes up while a burst of files is generated
+        if (len(self.worker.jobs) < 1):
+            self.save()
+
+    def size(self):
+        '''
+        Disk space taken up by the speech files in the manifest
+        :return: Size in bytes
+        '''
+        with self.lock:
+            return sum(entry[1] for entry in self.entries.values())
+
+    def remove(self, key):
+        '''
+        Drops an entry and its file. The caller must hold the lock.
+        :param: key Cache key
+        '''
+        del self.entries[key]
+        self.dirty = True
+        self.clips.pop(self.filePath(key), None)
+        try:
+            os.remove(self.filePath(key))
+        except OSError:
+            pass
+
+    def evict(self, keep=None):
+        '''
+        Removes the least recently used files until the cache fits in its size
+            limit
+        :param: keep (Optional) Key of an entry that must not be evicted
+        '''
+        with self.lock:
+            total = sum(entry[1] for entry in self.entries.values())
+            if (total <= self.maxBytes):
+                return
+            lru = sorted(self.entries.keys(),
+                key=lambda key: self.entries[key][2])
+            for key in lru:
+                if (total <= self.maxBytes):
+                    break
+                if (key == keep):
+                    continue
+                total -= self.entries[key][1]
+                self.remove(key)
+
+    def collect(self):
+        '''
+        Garbage collects the cache: entries that have not been asked for in a
+            long time or whose files have gone missing are dropped, and files
+            that the manifest does not know about are deleted
+        '''
+        now = time.time()
+        with self.lock:
+            for key, entry in list(self.entries.items()):
+                fileName = self.filePath(key)
+                if not(os.path.exists(fileName)):
+                    del self.entries[key]
+                    self.dirty = True
+                elif (((now - entry[2]) > ORPHAN_AGE)
+                        and not(fileName in self.texts)):
+                    self.remove(key)
+            known = set(self.entries.keys())
+        for name in os.listdir(self.path):
+            fileName = os.path.join(self.path, name)
+            # leave the manifest, files in use and anything still being
+            # generated alone
+            if ((name.startswith(MANIFEST_FILE))
+                    or (fileName in self.texts)
+                    or (self.worker.isQueued(fileName[:-len(TMP_SUFFIX)]))):
+                continue
+            if (os.path.splitext(name)[0] in known):
+                continue
+            try:
+                os.remove(fileName)
+            except OSError:
+                pass
+        self.evict()
+        self.save()
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+#/usr/bin/python
+from __future__ import print_function
+# Python standard lib imports
+import os
+import threading
+import traceback
+import multiprocessing
+try:
+    from Queue import PriorityQueue
+except ImportError:
+    from queue import PriorityQueue
+
+'''
+ttsworker.py
+Python class that generates text-to-speech files in the background, on a
+    bounded pool of worker threads
+@author: Schuyler Martin <schuylermartin45@gmail.com>
+'''
+__author__ = "Schuyler Martin"
+
+# Job priorities (lower runs first)
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 10
+# Number of synthesizers to run at once. espeak is CPU bound, so there is no
+# point in running more of them than there are cores.
+try:
+    DEFAULT_WORKERS = multiprocessing.cpu_count()
+except NotImplementedError:
+    DEFAULT_WORKERS = 2
+# Files are synthesized under this suffix and then renamed into place
+TMP_SUFFIX = ".tmp.wav"
+
+class TTSJob:
+    '''
+    Class that represents a single file to synthesize
+    '''
+    def __init__(self, text, fileName):
+        '''
+        Constructor
+        :param: text Text to synthesize
+        :param: fileName File name to write-out to
+        '''
+        self.text = text
+        self.fileName = fileName
+        # set once the file exists (or synthesis failed)
+        self.done = threading.Event()
+        self.started = False
+
+class TTSWorker:
+    '''
+    Class that runs text-to-speech synthesis on a pool of threads. Jobs are
+        run in priority order; a job that is needed right now can be moved to
+        the front of the line.
+    '''
+    def __init__(self, synth, workers=DEFAULT_WORKERS, onDone=None):
+        '''
+        Constructor
+        :param: synth Function that takes (text, fileName) and writes out a
+            text-to-speech file
+        :param: workers Number of files to synthesize at once
+        :param: onDone (Optional) Function called from the worker thread with
+            (fileName, success) after each job
+        '''
+        self.synth = synth
+        self.onDone = onDone
+        self.queue = PriorityQueue()
+        self.lock = threading.Lock()
+        # [file name] -> TTSJob for every file queued or being generated
+        self.jobs = {}
+        # keeps queue entries with equal priority in submission order
+        self.seq = 0
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self.run)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def put(self, priority, job):
+        '''
+        Adds a job to the queue
+        :param: priority Job priority
+        :param: job TTSJob object
+        '''
+        with self.lock:
+            self.seq += 1
+            seq = self.seq
+        self.queue.put((priority, seq, job))
+
+    def submit(self, text, fileName, priority=PRIORITY_LOW):
+        '''
+        Queues a file for synthesis, unless it already exists or is queued
+        :param: text Text to synthesize
+        :param: fileName File name to write-out to
+        :param: priority Job priority
+        '''
+        if (os.path.exists(fileName)):
+            return
+        with self.lock:
+            if (fileName in self.jobs):
+                return
+            job = TTSJob(text, fileName)
+            self.jobs[fileName] = job
+        self.put(priority, job)
+
+    def isReady(self, fileName):
+        '''
+        Checks if a file is available to be played
+        :param: fileName File name of the text-to-speech file
+        :return: True if the file exists and is not being written
+        '''
+        if (fileName in self.jobs):
+            return False
+        return os.path.exists(fileName)
+
+    def prioritize(self, fileName):
+        '''
+        Moves a queued file to the front of the line
+        :param: fileName File name of the text-to-speech file
+        '''
+        job = self.jobs.get(fileName)
+        if ((job != None) and not(job.started)):
+            # the old queue entry is skipped once the job has run
+            self.put(PRIORITY_HIGH, job)
+
+    def wait(self, fileName, timeout):
+        '''
+        Waits (a bounded amount of time) for a file to be generated, moving it
+            to the front of the line
+        :param: fileName File name of the text-to-speech file
+        :param: timeout Maximum time to wait, in seconds
+        :return: True if the file is ready
+        '''
+        job = self.jobs.get(fileName)
+        if (job != None):
+            self.prioritize(fileName)
+            job.done.wait(timeout)
+        return self.isReady(fileName)
+
+    def isQueued(self, fileName):
+        '''
+        Checks if a file is queued or being generated
+        :param: fileName File name of the text-to-speech file
+        :return: True if a job for the file is outstanding
+        '''
+        return (fileName in self.jobs)
+
+    def waitIdle(self):
+        '''
+        Blocks until every queued file has been generated
+        '''
+        while (True):
+            with self.lock:
+                jobs = list(self.jobs.values())
+            if (len(jobs) < 1):
+                return
+            for job in jobs:
+                job.done.wait()
+
+    def run(self):
+        '''
+        Worker thread loop
+        '''
+        while (True):
+            priority, seq, job = self.queue.get()
+            with self.lock:
+                # already run via a higher priority entry
+                if (job.started):
+                    continue
+                job.started = True
+            # write to a temporary file so a half-written file is never
+            # mistaken for a finished one
+            tmpName = job.fileName + TMP_SUFFIX
+            success = False
+            try:
+                self.synth(job.text, tmpName)
+                os.rename(tmpName, job.fileName)
+                success = True
+            except Exception:
+                # anything the synthesizer raises (such as a wav error for
+                # empty or cut short espeak output) only fails this file
+                print("Warning: Unable to generate speech file "
+                    + job.fileName)
+                if (os.path.exists(tmpName)):
+                    try:
+                        os.remove(tmpName)
+                    except OSError:
+                        pass
+            finally:
+                with self.lock:
+                    del self.jobs[job.fileName]
+            try:
+                if (self.onDone != None):
+                    self.onDone(job.fileName, success)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                # never leave waiters hanging
+                job.done.set()
+
+def main():
+    '''
+    Main execution point for testing
+    '''
+
+if __name__ == '__main__':
+    main()